@@ -16,10 +16,12 @@ class FlutterComicClient(GopHttpClientApi):
 
     comics_path = '/fluttercomic/%s/comics'
     comic_path = '/fluttercomic/%s/comics/%s'
+    hot_path = '/fluttercomic/public/hot/comics'
 
     mark_path = '/fluttercomic/private/comic/%s/user/%s'
     buy_path = '/fluttercomic/private/comic/%s/chapter/%s/user/%s'
     chapter_path = '/fluttercomic/private/comic/%s/chapters/%s'
+    progress_path = '/fluttercomic/private/comic/%s/chapters/%s/progress'
 
     platforms_path = '/fluttercomic/platforms'
 
@@ -104,7 +106,8 @@ class FlutterComicClient(GopHttpClientApi):
 
     def user_paylogs(self, uid, token, body=None):
         headers = {common.TOKENNAME: token, common.FERNETHEAD: 'yes'}
-        resp, results = self.put(action=self.user_path_ex % (self.PRIVATE, uid, 'paylogs'), headers=headers)
+        resp, results = self.get(action=self.user_path_ex % (self.PRIVATE, uid, 'paylogs'), headers=headers,
+                                 body=body)
         if results['resultcode'] != common.RESULT_SUCCESS:
             raise ServerExecuteRequestError(message='fluttercomic user create order fail:%d' % results['resultcode'],
                                             code=resp.status_code,
@@ -176,6 +179,14 @@ class FlutterComicClient(GopHttpClientApi):
                                             resone=results['result'])
         return results
 
+    def comics_hot(self, body=None):
+        resp, results = self.get(action=self.hot_path, body=body, version=self.PUBLICVERSION)
+        if results['resultcode'] != common.RESULT_SUCCESS:
+            raise ServerExecuteRequestError(message='list fluttercomic hot comics fail:%d' % results['resultcode'],
+                                            code=resp.status_code,
+                                            resone=results['result'])
+        return results
+
     def comics_create(self, token, body=None):
         headers = {common.TOKENNAME: token, common.FERNETHEAD: 'yes'}
         resp, results = self.retryable_post(action=self.comics_path % self.PRIVATE, headers=headers)
@@ -251,6 +262,16 @@ class FlutterComicClient(GopHttpClientApi):
                                             resone=results['result'])
         return results
 
+    def chapter_pages(self, cid, chapter, uid, token, body=None):
+        headers = {common.TOKENNAME: token, common.FERNETHEAD: 'yes'}
+        resp, results = self.get(action=self.buy_path % (cid, chapter, uid),
+                                 headers=headers, body=body)
+        if results['resultcode'] != common.RESULT_SUCCESS:
+            raise ServerExecuteRequestError(message='get fluttercomic chapter pages fail:%d' % results['resultcode'],
+                                            code=resp.status_code,
+                                            resone=results['result'])
+        return results
+
     def chapter_create(self, cid, chapter, token, body):
         headers = {common.TOKENNAME: token, common.FERNETHEAD: 'yes'}
         resp, results = self.retryable_post(action=self.chapter_path % (self.PRIVATE, cid, chapter),
@@ -261,3 +282,14 @@ class FlutterComicClient(GopHttpClientApi):
                                             code=resp.status_code,
                                             resone=results['result'])
         return results
+
+    def chapter_progress(self, cid, chapter, token, body=None):
+        headers = {common.TOKENNAME: token, common.FERNETHEAD: 'yes'}
+        resp, results = self.get(action=self.progress_path % (cid, chapter),
+                                 headers=headers, body=body)
+        if results['resultcode'] != common.RESULT_SUCCESS:
+            raise ServerExecuteRequestError(message='get fluttercomic chapter progress fail:%d' %
+                                                    results['resultcode'],
+                                            code=resp.status_code,
+                                            resone=results['result'])
+        return results
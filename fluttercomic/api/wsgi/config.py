@@ -1,6 +1,8 @@
 from simpleutil.config import cfg
+from simpleutil.config import types
 from simpleservice.ormdb.config import database_opts
 
+from fluttercomic.common import SIZES
 from fluttercomic.plugin.platforms.config import platforms_opts
 
 CONF = cfg.CONF
@@ -23,6 +25,37 @@ comic_opts = [
     cfg.IntOpt('one',
                default=25,
                help='One chapter cost coins'),
+    cfg.StrOpt('size',
+               default='1200x900',
+               choices=SIZES,
+               help='Chapter img size'),
+    cfg.ListOpt('renditions',
+                default=[],
+                item_type=types.String(choices=SIZES),
+                help='Chapter img extra sizes, page file name is <page>_<size>.<ext>'),
+    cfg.StrOpt('cdnurl',
+               default='/cdn',
+               help='Url path prefix of cdn dir'),
+    cfg.StrOpt('url_secret',
+               secret=True,
+               help='Secret of nginx secure_link md5, sign chapter img url and '
+                    'stop sending static chapter key when set'),
+    cfg.IntOpt('url_expires',
+               default=600,
+               min=30, max=86400,
+               help='Signed chapter img url expires seconds'),
+    cfg.StrOpt('storage',
+               default='local',
+               choices=['local', 's3'],
+               help='Converted img storage, s3 need boto3 and options in [fluttercomic.s3]'),
+    cfg.IntOpt('stats_interval',
+               default=5,
+               min=1, max=300,
+               help='Comic view and buy counters flush interval seconds'),
+    cfg.IntOpt('hot_cache',
+               default=60,
+               min=0, max=3600,
+               help='Hot comics listing cache seconds'),
 ]
 
 
@@ -3,11 +3,13 @@ import os
 import time
 import random
 import string
+import hashlib
+import webob
 import webob.exc
 import msgpack
 import eventlet
+from eventlet import tpool
 
-import contextlib
 import shutil
 
 from sqlalchemy.sql import and_
@@ -41,15 +43,26 @@ from fluttercomic.models import UserOwn
 from fluttercomic.models import UserBook
 from fluttercomic.models import UserPayLog
 from fluttercomic.models import Comic
+from fluttercomic.models import ChapterUpload
 from fluttercomic.models import Order
 from fluttercomic.api import endpoint_session
 from fluttercomic.api.wsgi.token import verify
 from fluttercomic.api.wsgi.token import M
 from fluttercomic.api.wsgi.token import online
 from fluttercomic.api.wsgi.utils import format_chapters
+from fluttercomic.api.wsgi.utils import entitled
+from fluttercomic.api.wsgi.utils import chapter_info
+from fluttercomic.api.wsgi.utils import chapter_bytes
+from fluttercomic.api.wsgi.utils import prefetch_chapters
+from fluttercomic.api.wsgi.sign import PageSigner
+from fluttercomic.api.wsgi import progress as chapter_progress
+from fluttercomic.api.wsgi import stats
 from fluttercomic.api.wsgi.controllers import WSPORTS
 
 from fluttercomic.plugin import convert
+from fluttercomic.plugin.convert import pages
+from fluttercomic.plugin.convert import sidecar
+from fluttercomic.plugin import storage
 from fluttercomic.api import exceptions
 
 LOG = logging.getLogger(__name__)
@@ -66,6 +79,25 @@ FAULT_MAP = {
     MultipleResultsFound: webob.exc.HTTPInternalServerError
 }
 
+SIGNER = PageSigner(CF.url_secret, CF.cdnurl, CF.url_expires) if CF.url_secret else None
+
+PROGRESS = chapter_progress.ProgressRegistry()
+# 进度长轮询最长等待时间
+MAXPROGRESSWAIT = 30
+# 预取清单最多章节
+MAXPREFETCH = 5
+# 章节完成后元数据文件不会变化
+METAMAXAGE = 31536000
+# staging目录清理间隔
+STAGINGGC = 600
+# 没有上传预留的staging目录保留时间
+STAGINGGRACE = 300
+
+STORAGE = storage.load(CF.storage, CF.basedir)
+
+COUNTER = stats.ComicCounter(endpoint_session, CF.stats_interval)
+HOTCOMICS = stats.HotComics(endpoint_session, CF.hot_cache)
+
 COVERUPLOAD = {
     'type': 'object',
     'required': ['fileinfo'],
@@ -117,6 +149,8 @@ NEWCHAPTER = {
              'impl': {'oneOf': [WEBSOCKETUPLOAD, SPIDERUPLOAD, LOCAL]},
              'timeout': {'type': 'integer', 'minimum': 30, 'maximun': 1200},
              'strict': {'type': 'boolean', 'description': '是否严格模式, 非严格模式直接跳过不是图片的文件'},
+             'order': {'type': 'string', 'minLength': 1, 'maxLength': 64,
+                       'description': '图片排序规则, natural/page/last或带数字分组的正则'},
          }
 }
 
@@ -156,21 +190,39 @@ class _prepare_comic_path(object):
         self._path = path
 
 
-@contextlib.contextmanager
-def _prepare_chapter_path(comic, chapter):
-    comic_path = ComicRequest.comic_path(comic)
+def _prefetch_count(body):
+    try:
+        return min(int(body.get('prefetch', 0)), MAXPREFETCH)
+    except (TypeError, ValueError):
+        raise InvalidArgument('Prefetch value error')
+
+
+def _comic_workdir(cid):
+    """远程存储时本地漫画目录只是工作目录, 只存在于创建漫画的节点, 不存在时创建"""
+    path = ComicRequest.comic_path(cid)
+    if not STORAGE.LOCAL and not os.path.exists(path):
+        try:
+            os.makedirs(path, 0o755)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+    return path
+
+
+def _prepare_chapter_path(comic, chapter, token):
+    comic_path = _comic_workdir(comic)
     chapter_path = ComicRequest.chapter_path(comic, chapter)
+    staging_path = ComicRequest.staging_path(comic, chapter, token)
 
     if not os.path.exists(comic_path):
         raise exceptions.ComicFolderError('Comic path not exist')
     if os.path.exists(chapter_path):
         raise exceptions.ComicFolderError('Chapter path alreday exist')
+    # 已经获取上传预留, 残留的staging目录可以直接删除
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
 
-    os.makedirs(chapter_path, 0o755)
-    try:
-        yield
-    except Exception:
-        shutil.rmtree(chapter_path)
+    os.makedirs(staging_path, 0o755)
 
 
 @singleton.singleton
@@ -178,9 +230,11 @@ class ComicRequest(MiddlewareContorller):
 
     ADMINAPI = False
 
-    cdndir = os.path.join(CF.basedir, 'cdn')
+    cdndir = os.path.join(CF.basedir, storage.CDNDIR)
     logdir  = os.path.join(CF.basedir, 'log')
     tmpdir = os.path.join(CF.basedir, 'tmp')
+    stagingdir = os.path.join(CF.basedir, 'staging')
+    gctime = 0
 
     def __init__(self):
 
@@ -190,6 +244,17 @@ class ComicRequest(MiddlewareContorller):
             os.makedirs(self.logdir, 0o755)
         if not os.path.exists(self.tmpdir):
             os.makedirs(self.tmpdir, 0o755)
+        if not os.path.exists(self.stagingdir):
+            os.makedirs(self.stagingdir, 0o755)
+        # 章节转换完成后rename到cdn目录, 必须在同一个文件系统
+        if os.stat(self.stagingdir).st_dev != os.stat(self.cdndir).st_dev:
+            raise ValueError('Staging dir %s and cdn dir %s not in same filesystem' %
+                             (self.stagingdir, self.cdndir))
+
+    @staticmethod
+    def renditions():
+        """extra chapter img sizes, page file is <page>_<size>.<ext>"""
+        return [size for size in CF.renditions if size != CF.size]
 
     @staticmethod
     def comic_path(comic):
@@ -200,19 +265,26 @@ class ComicRequest(MiddlewareContorller):
         return os.path.join(ComicRequest.cdndir, str(comic), str(chapter))
 
     @staticmethod
-    def _convert_new_chapter_from_dir(src, dst):
+    def staging_path(comic, chapter, token):
+        """每个预留独立的staging目录, 被回收的上传不会写入新预留的目录"""
+        return os.path.join(ComicRequest.stagingdir, '%d.%d.%d' % (comic, chapter, token))
+
+    @staticmethod
+    def _convert_new_chapter_from_dir(src, dst, order=None):
         for root, dirs, files in os.walk(src, topdown=True):
             if dirs:
-                LOG.error('folder %s in local new chaper path' % dir)
-                raise ValueError('folder %s in local new chaper path' % dir)
+                LOG.error('folder %s in local new chaper path' % dirs[0])
+                raise ValueError('folder %s in local new chaper path' % dirs[0])
             if not files:
                 raise exceptions.ComicUploadError('No file in path %s' % root)
             if len(files) >  common.MAXCHAPTERPIC:
                 LOG.error('Chapter img count over size')
                 raise ValueError('Chapter img count over size')
-            for filename in files:
+            # 按页序重命名, 转换程序用同样规则排序结果一致
+            for index, filename in enumerate(pages.sort_pages(files, order)):
+                ext = os.path.splitext(filename)[1].lower()
                 try:
-                    os.rename(os.path.join(src, filename), os.path.join(dst, filename))
+                    os.rename(os.path.join(src, filename), os.path.join(dst, '%03d%s' % (index + 1, ext)))
                 except (OSError, IOError):
                     raise
             return len(files)
@@ -239,16 +311,33 @@ class ComicRequest(MiddlewareContorller):
         LOG.info('extract chapter file success')
         return count
 
-    def _convert_new_chapter(self, src, cid, ext, chapter, key, logfile, strict=True):
-        chapter_path = self.chapter_path(cid, chapter)
+    def _convert_new_chapter(self, src, cid, ext, chapter, token, key, logfile, strict=True, order=None):
+        staging_path = self.staging_path(cid, chapter, token)
+        PROGRESS.stage(cid, chapter, chapter_progress.EXTRACTING)
         if os.path.isdir(src):
-            count = self._convert_new_chapter_from_dir(src, chapter_path)
+            self._convert_new_chapter_from_dir(src, staging_path, order)
         else:
-            count = self._convert_new_chapter_from_file(src, chapter_path)
+            self._convert_new_chapter_from_file(src, staging_path)
         _key ='%d%s' % (cid, key)
-        convert.convert_chapter(dst=chapter_path, ext=ext, key=_key, logfile=logfile, strict=strict)
-        LOG.info('convert chapter path finish')
-        return count
+        PROGRESS.stage(cid, chapter, chapter_progress.CONVERTING)
+        # 在原生线程中等待转换进程, 不阻塞hub
+        job = tpool.execute(convert.convert_chapter,
+                            dst=staging_path, ext=ext, key=_key, order=order,
+                            size=CF.size, renditions=self.renditions(),
+                            logfile=logfile, strict=strict,
+                            progress=PROGRESS.callback(cid, chapter))
+        # 上传文件数不一定是页数, 非严格模式跳过了不是图片的文件
+        count = convert.count_pages(staging_path, ext)
+        if not count:
+            raise exceptions.ComicUploadError('No page converted in chapter %d.%d' % (cid, chapter))
+        size = sum(convert.page_sizes(staging_path, ext, count))
+        # 转换完成后一次rename发布, cdn不会读到转换中的图片
+        self._publish(cid, chapter, token, staging_path)
+        files = tpool.execute(STORAGE.publish, storage.chapter_key(cid, chapter))
+        LOG.info('Chapter %d.%d publish %d files to %s storage' % (cid, chapter, files, CF.storage))
+        LOG.info('convert chapter path finish, %d pages %d bytes, cpu time %.2fs, elapsed %.2fs' %
+                 (count, size, job.utime + job.stime, job.elapsed))
+        return count, size
 
     def index(self, req, body=None):
         """列出漫画"""
@@ -321,17 +410,57 @@ class ComicRequest(MiddlewareContorller):
                 chapter = owns.chapter
         elif comic.status == common.HIDE:
             raise exceptions.ComicError('Comic status error')
-        return resultutils.results(result='show comic success',
-                                   data=[dict(cid=comic.cid,
-                                              name=comic.name,
-                                              author=comic.author,
-                                              type=comic.type,
-                                              region=comic.region,
-                                              point=comic.point,
-                                              last=comic.last,
-                                              lastup=comic.lastup,
-                                              ext=comic.ext,
-                                              chapters=format_chapters(point, comic.chapters, chapter))])
+        COUNTER.view(cid)
+        data = dict(cid=comic.cid,
+                    name=comic.name,
+                    author=comic.author,
+                    type=comic.type,
+                    region=comic.region,
+                    point=comic.point,
+                    last=comic.last,
+                    lastup=comic.lastup,
+                    ext=comic.ext,
+                    chapters=format_chapters(point, comic.chapters, chapter,
+                                             keys=SIGNER is None))
+        body = body or {}
+        count = _prefetch_count(body)
+        if count > 0:
+            try:
+                start = int(body.get('start', max(chapter, 1)))
+            except (TypeError, ValueError):
+                raise InvalidArgument('Prefetch start value error')
+            data['prefetch'] = self._prefetch(comic, uid, start, count, point, chapter)
+        return resultutils.results(result='show comic success', data=[data])
+
+    @staticmethod
+    def _prefetch(comic, uid, start, count, point, payed=0):
+        """从start开始连续可读章节的预取清单"""
+        manifest = []
+        expires = SIGNER.deadline() if SIGNER else None
+        for chapter, info in prefetch_chapters(point, comic.chapters, start, count, payed):
+            prefetch = dict(chapter=chapter, max=info[0], bytes=chapter_bytes(info))
+            if SIGNER:
+                prefetch['expires'] = expires
+                prefetch['urls'] = SIGNER.chapter(comic.cid, chapter, info[0], comic.ext,
+                                                  uid or 0, expires=expires)
+            else:
+                prefetch['key'] = info[1]
+            manifest.append(prefetch)
+        return manifest
+
+    def hot(self, req, body=None):
+        """热门漫画"""
+        body = body or {}
+        period = body.get('period', 'day')
+        if period not in stats.PERIODS:
+            raise InvalidArgument('Hot period value error')
+        try:
+            limit = int(body.get('limit', 20))
+        except (TypeError, ValueError):
+            raise InvalidArgument('Hot limit value error')
+        if limit < 1 or limit > stats.MAXHOT:
+            raise InvalidArgument('Hot limit must between 1 and %d' % stats.MAXHOT)
+        return resultutils.results(result='list hot comics success', data=HOTCOMICS.get(period, limit))
 
     @verify(vtype=M)
     def update(self, req, cid, body=None):
@@ -349,7 +478,7 @@ class ComicRequest(MiddlewareContorller):
         timeout = body.get('timeout', 20)
         fileinfo = body.get('fileinfo')
 
-        comic_path = self.comic_path(cid)
+        comic_path = _comic_workdir(cid)
 
         logfile = '%d.conver.%d.log' % (int(time.time()), cid)
         logfile = os.path.join(self.logdir, logfile)
@@ -373,8 +502,9 @@ class ComicRequest(MiddlewareContorller):
                 LOG.error('comic cover file %s not exist' % tmpfile)
             else:
                 LOG.info('Call shell command convert')
-                convert.convert_cover(tmpfile, rename=rename, logfile=logfile)
-                LOG.info('Convert execute success')
+                job = tpool.execute(convert.convert_cover, tmpfile, rename=rename, logfile=logfile)
+                LOG.info('Convert execute success, cpu time %.2fs' % (job.utime + job.stime))
+                tpool.execute(STORAGE.put, '%s/%s' % (storage.comic_key(cid), rename))
         ws = LaunchRecverWebsocket(WEBSOCKETPROC)
         try:
             uri = ws.upload(user=CF.user, group=CF.group,
@@ -398,21 +528,24 @@ class ComicRequest(MiddlewareContorller):
         session = endpoint_session(readonly=True)
         query = model_query(session, Comic, filter=Comic.cid == cid)
         comic = query.one()
-        src = os.path.join(self.chapter_path(comic.cid, 1), '1.%s' % comic.ext)
-        dst = os.path.join(self.comic_path(comic.chapters), 'main.%s' % comic.ext)
-        if os.path.exists(dst):
+        # 通过存储后端复制, 远程存储时本节点不一定有章节文件
+        src = '%s/1.%s' % (storage.chapter_key(comic.cid, 1), comic.ext)
+        dst = '%s/main.%s' % (storage.comic_key(comic.cid), comic.ext)
+        if tpool.execute(STORAGE.exists, dst):
             return resultutils.results('Conver exist, do nothing')
-        if not os.path.exists(src):
+        if not tpool.execute(STORAGE.exists, src):
             raise InvalidArgument('Auth set cover pic fail, chapter 1 not exist')
-        shutil.copy(src, dst)
+        tpool.execute(STORAGE.copy, src, dst)
         return resultutils.results('Auto set conver success')
 
     @verify()
     def buy(self, req, cid, chapter, uid, body=None):
         """购买一个章节"""
+        body = body or {}
         cid = int(cid)
         chapter = int(chapter)
         uid = int(uid)
+        prefetch = _prefetch_count(body)
         session = endpoint_session()
         query = model_query(session, Comic, filter=Comic.cid == cid)
         uquery = session.query(User).filter(User.uid == uid).with_for_update(nowait=True)
@@ -448,16 +581,25 @@ class ComicRequest(MiddlewareContorller):
                 session.flush()
             else:
                 if owns.chapter >= chapter:
-                    return resultutils.results(result='get chapter success, buy fail',
-                                               data=[dict(cid=comic.cid,
-                                                          name=comic.name,
-                                                          author=comic.author,
-                                                          type=comic.type,
-                                                          ext=comic.ext,
-                                                          chapters=format_chapters(comic.point,
-                                                                                   comic.chapters, owns.chapter))])
+                    data = dict(cid=comic.cid,
+                                name=comic.name,
+                                author=comic.author,
+                                type=comic.type,
+                                ext=comic.ext,
+                                chapters=format_chapters(comic.point,
+                                                         comic.chapters, owns.chapter,
+                                                         keys=SIGNER is None))
+                    if prefetch > 0:
+                        data['prefetch'] = self._prefetch(comic, uid, chapter, prefetch,
+                                                          comic.point, owns.chapter)
+                    return resultutils.results(result='get chapter success, buy fail', data=[data])
                 if owns.chapter + 1 != chapter:     # 不允许跳章节购买
                     raise InvalidArgument('buy chapter fail, you need buy chapter %d first' % (owns.chapter + 1))
+                # UserPayLog按time分区后主键包含time, 在用户锁内检查章节没有重复购买
+                if model_query(session, UserPayLog.time,
+                               filter=and_(UserPayLog.uid == uid, UserPayLog.cid == cid,
+                                           UserPayLog.chapter == chapter)).first():
+                    raise InvalidArgument('Chapter %d already paid' % chapter)
                 owns.chapter = chapter
                 session.flush()
                 paylog = UserPayLog(uid=uid, cid=cid, chapter=chapter,
@@ -471,16 +613,75 @@ class ComicRequest(MiddlewareContorller):
                 user.coins = coins - coin
                 user.gifts = gifts - gift
 
+        COUNTER.buy(cid)
+        data = dict(cid=comic.cid,
+                    name=comic.name,
+                    author=comic.author,
+                    type=comic.type,
+                    ext=comic.ext,
+                    chapters=format_chapters(comic.point,
+                                             comic.chapters,
+                                             owns.chapter,
+                                             keys=SIGNER is None))
+        if prefetch > 0:
+            data['prefetch'] = self._prefetch(comic, uid, chapter, prefetch, comic.point, owns.chapter)
+        return resultutils.results(result='buy chapter success', data=[data])
 
-        return resultutils.results(result='buy chapter success',
-                                   data=[dict(cid=comic.cid,
-                                              name=comic.name,
-                                              author=comic.author,
-                                              type=comic.type,
-                                              ext=comic.ext,
-                                              chapters=format_chapters(comic.point,
-                                                                       comic.chapters,
-                                                                       owns.chapter))])
+    @verify()
+    def pages(self, req, cid, chapter, uid, body=None):
+        """章节图片签名url"""
+        if SIGNER is None:
+            raise InvalidArgument('Chapter img url sign is disabled')
+        body = body or {}
+        cid = int(cid)
+        chapter = int(chapter)
+        uid = int(uid)
+        size = body.get('size')
+        session = endpoint_session(readonly=True)
+        query = model_query(session, Comic, filter=Comic.cid == cid)
+        comic = query.one()
+        if comic.last < chapter or chapter < 1:
+            raise InvalidArgument('Chapter not exist')
+        chapters = msgpack.unpackb(comic.chapters)
+        if len(chapters) < chapter:
+            raise InvalidArgument('Chapter is uploading')
+        info = chapters[chapter - 1]
+        if size and size != CF.size and size not in (info[2] if len(info) > 2 else []):
+            raise InvalidArgument('Chapter size %s not found' % size)
+        if not entitled(comic.point, chapter):
+            query = model_query(session, UserOwn.chapter, filter=and_(UserOwn.uid == uid, UserOwn.cid == cid))
+            owns = query.one_or_none()
+            if not owns or not entitled(comic.point, chapter, owns.chapter):
+                raise InvalidArgument('Chapter not payed')
+        expires = SIGNER.deadline()
+        urls = SIGNER.chapter(cid, chapter, info[0], comic.ext, uid,
+                              size=size if size != CF.size else None,
+                              expires=expires)
+        return resultutils.results(result='sign chapter pages success',
+                                   data=[dict(cid=cid, chapter=chapter, expires=expires, urls=urls)])
+
+    def meta(self, req, cid, chapter, body=None):
+        """章节页面元数据文件, 每页宽高/大小/hash"""
+        body = body or {}
+        cid = int(cid)
+        chapter = int(chapter)
+        size = body.get('size')
+        if size and size != CF.size and size not in CF.renditions:
+            raise InvalidArgument('Chapter size %s not found' % size)
+        session = endpoint_session(readonly=True)
+        query = model_query(session, Comic.last, filter=Comic.cid == cid)
+        comic = query.one()
+        if comic.last < chapter or chapter < 1:
+            raise InvalidArgument('Chapter not exist')
+        key = '%s/%s' % (storage.chapter_key(cid, chapter), sidecar.filename(size if size != CF.size else None))
+        buf = tpool.execute(STORAGE.get, key)
+        if buf is None:
+            return webob.exc.HTTPNotFound()
+        resp = webob.Response(request=req, status=200, content_type='application/octet-stream',
+                              body=buf, conditional_response=True)
+        resp.etag = hashlib.md5(buf).hexdigest()
+        resp.cache_control = 'public, max-age=%d, immutable' % METAMAXAGE
+        return resp
 
     @verify()
     def mark(self, req, cid, uid, body=None):
@@ -523,18 +724,22 @@ class ComicRequest(MiddlewareContorller):
         impl = body.get('impl')
         timeout = body.get('timeout')
         strict = body.get('strict', True)
+        order = body.get('order', pages.NATURAL)
+        try:
+            pages.sortkey(order)
+        except ValueError as e:
+            raise InvalidArgument(e.message)
         logfile = os.path.join(self.logdir, '%d.chapter.%d.%d.log' %
                                (int(time.time()), cid, chapter))
-        comic_path = self.comic_path(cid)
         # 创建资源url加密key
         key = ''.join(random.sample(string.lowercase, 6))
         ext = ''
 
         if impl['type'] == 'websocket':
-            tmpfile = 'chapter.%d.uploading' % int(time.time())
+            tmpfile = '%d.%d.uploading' % (cid, int(time.time()))
             fileinfo = impl.get('fileinfo')
             fileinfo.update({'overwrite': tmpfile})
-            tmpfile = os.path.join(comic_path, tmpfile)
+            tmpfile = os.path.join(self.stagingdir, tmpfile)
             if os.path.exists(tmpfile):
                 raise exceptions.ComicUploadError('Upload chapter file fail')
             try:
@@ -547,18 +752,19 @@ class ComicRequest(MiddlewareContorller):
                 LOG.info('Try convert new chapter %d.%d from file:%s, type:%s' % (cid, chapter, tmpfile, ext))
                 # checket chapter file
                 try:
-                    count = self._convert_new_chapter(tmpfile, cid, ext, chapter, key, logfile, strict)
+                    count, size = self._convert_new_chapter(tmpfile, cid, ext, chapter, token, key, logfile,
+                                                            strict, order)
+                    self._finish(cid, chapter, token, dict(max=count, key=key, renditions=self.renditions(),
+                                                           bytes=size))
                 except Exception as e:
                     LOG.error('convert new chapter from websocket upload file fail')
-                    self._unfinish(cid, chapter)
+                    self._unfinish(cid, chapter, token, error=e.message or e.__class__.__name__)
                     try:
                         if os.path.exists(tmpfile):
                             os.remove(tmpfile)
                     except (OSError, IOError):
                         LOG.error('Revmove websocket uploade file %s fail' % tmpfile)
                     raise e
-                else:
-                    self._finishe(cid, chapter, dict(max=count, key=key))
         elif impl['type'] == 'local':
             path = impl['path']
             if '.' in path:
@@ -572,62 +778,62 @@ class ComicRequest(MiddlewareContorller):
             def _local_func():
                 LOG.info('Try convert new chapter %d.%d from path:%s, type:%s' % (cid, chapter, path, ext))
                 try:
-                    count = self._convert_new_chapter(path, cid, ext, chapter, key, logfile, strict)
+                    count, size = self._convert_new_chapter(path, cid, ext, chapter, token, key, logfile,
+                                                            strict, order)
+                    self._finish(cid, chapter, token, dict(max=count, key=key, renditions=self.renditions(),
+                                                           bytes=size))
                 except Exception as e:
                     LOG.error('convert new chapter from local dir %s fail, %s' % (path, e.__class__.__name__))
                     if LOG.isEnabledFor(logging.DEBUG):
                         LOG.exception(e.message)
-                    self._unfinish(cid, chapter)
+                    self._unfinish(cid, chapter, token, error=e.message or e.__class__.__name__)
                     raise
-                else:
-                    self._finish(cid, chapter, dict(max=count, key=key))
         else:
             raise NotImplementedError
 
-
-        session = endpoint_session()
-        query = session.query(Comic).filter(Comic.cid == cid).with_for_update()
-
+        try:
+            comic, token = self._reserve(cid, chapter, timeout)
+        except Exception:
+            if impl['type'] == 'websocket':
+                WSPORTS.add(port)
+            raise
+        ext = comic.ext
         worker = None
+        if time.time() - ComicRequest.gctime > STAGINGGC:
+            ComicRequest.gctime = time.time()
+            eventlet.spawn_n(self._gc_staging)
+        PROGRESS.start(cid, chapter, chapter_progress.UPLOADING if impl['type'] == 'websocket'
+                       else chapter_progress.EXTRACTING)
 
-        with _prepare_chapter_path(cid, chapter):
-            with session.begin():
-                comic = query.one()
-                LOG.info('Crate New chapter of %d' % cid)
-                last = comic.last
-                if (last +1) != chapter:
-                    raise InvalidArgument('New chapter value  error')
+        # 上传与转换过程中不锁定漫画
+        try:
+            _prepare_chapter_path(cid, chapter, token)
+        except Exception:
+            if impl['type'] == 'websocket':
+                WSPORTS.add(port)
+            self._unfinish(cid, chapter, token, remove=False, error='prepare chapter path fail')
+            raise
 
-                chapters = msgpack.unpackb(comic.chapters)
-                if len(chapters) != comic.last:
-                    LOG.error('Comic chapter is uploading')
-                    raise InvalidArgument('Comic chapter is uploading')
-                comic.last = chapter
-                session.flush()
-                ext = comic.ext
-                # 注意: 下面的操作会导致漫画被锁定较长时间,
-                if impl['type'] == 'websocket':
-                    ws = LaunchRecverWebsocket(WEBSOCKETPROC)
-                    try:
-                        uri = ws.upload(user=CF.user, group=CF.group,
-                                        ipaddr=CF.ipaddr, port=port,
-                                        rootpath=comic_path, fileinfo=impl['fileinfo'],
-                                        logfile=logfile,
-                                        timeout=timeout)
-                    except Exception:
-                        WSPORTS.add(port)
-                        return resultutils.results(result='upload cover get websocket uri fail',
-                                                   resultcode=manager_common.RESULT_ERROR)
-                    else:
-
-                        ws.asyncwait(exitfunc=_websocket_func)
-                        worker = uri
-                    LOG.info('New chapter from websocket port %d' % port)
-                elif impl['type'] == 'local':
-                    LOG.info('New chapter from local path %s, spawning' % path)
-                    eventlet.spawn(_local_func)
-                else:
-                    raise NotImplementedError
+        if impl['type'] == 'websocket':
+            ws = LaunchRecverWebsocket(WEBSOCKETPROC)
+            try:
+                uri = ws.upload(user=CF.user, group=CF.group,
+                                ipaddr=CF.ipaddr, port=port,
+                                rootpath=self.stagingdir, fileinfo=impl['fileinfo'],
+                                logfile=logfile,
+                                timeout=timeout)
+            except Exception:
+                WSPORTS.add(port)
+                self._unfinish(cid, chapter, token, error='get websocket uri fail')
+                return resultutils.results(result='upload cover get websocket uri fail',
+                                           resultcode=manager_common.RESULT_ERROR)
+            else:
+                ws.asyncwait(exitfunc=_websocket_func)
+                worker = uri
+            LOG.info('New chapter from websocket port %d' % port)
+        elif impl['type'] == 'local':
+            LOG.info('New chapter from local path %s, spawning' % path)
+            eventlet.spawn(_local_func)
 
         return resultutils.results(result='new chapter spawning',
                                    data=[dict(cid=comic.cid, name=comic.name, worker=worker)])
@@ -635,63 +841,193 @@ class ComicRequest(MiddlewareContorller):
     def finished(self, req, cid, chapter, body=None):
         cid = int(cid)
         chapter = int(chapter)
+        progress = PROGRESS.get(cid, chapter)
+        if progress:
+            if progress.stage == chapter_progress.FINISHED:
+                return resultutils.results(result='chapter is finish')
+            if progress.stage == chapter_progress.FAILED:
+                raise InvalidArgument('Chapter upload fail: %s' % progress.error)
+            return resultutils.results(result='chapter is unfinish', resultcode=manager_common.RESULT_ERROR)
+        # 不在当前进程中上传, 查询数据库
         session = endpoint_session(readonly=True)
-        query = session.query(Comic).filter(Comic.cid == cid)
+        query = model_query(session, Comic.last, filter=Comic.cid == cid)
         comic = query.one()
-        if comic.last < chapter:
-            raise InvalidArgument('Last chapter less then check chpater, chapter upload fail?')
-            # return resultutils.results(result='chapter is unfinish', resultcode=manager_common.RESULT_ERROR)
-        elif comic.last == chapter:
-            if len(msgpack.unpackb(comic.chapters)) != chapter:
-                return resultutils.results(result='chapter is unfinish', resultcode=manager_common.RESULT_ERROR)
-        return resultutils.results(result='chapter is finish')
+        if comic.last >= chapter:
+            return resultutils.results(result='chapter is finish')
+        query = model_query(session, ChapterUpload,
+                            filter=and_(ChapterUpload.cid == cid, ChapterUpload.chapter == chapter))
+        if query.one_or_none():
+            return resultutils.results(result='chapter is unfinish', resultcode=manager_common.RESULT_ERROR)
+        raise InvalidArgument('Chapter not uploading, chapter upload fail?')
+
+    @verify(vtype=M)
+    def progress(self, req, cid, chapter, body=None):
+        """章节上传转换进度, 带version与wait时长轮询到进度变化"""
+        body = body or {}
+        cid = int(cid)
+        chapter = int(chapter)
+        wait = min(int(body.get('wait', 0)), MAXPROGRESSWAIT)
+        version = body.get('version')
+        if wait > 0 and version is not None:
+            progress = PROGRESS.wait(cid, chapter, int(version), wait)
+        else:
+            progress = PROGRESS.get(cid, chapter)
+        if not progress:
+            return self.finished(req, cid, chapter, body)
+        return resultutils.results(result='get chapter progress success', data=[progress.to_dict()])
 
     @staticmethod
-    def _finish(cid, chapter, body):
-        """章节上传完成 通知开放"""
-        max = body.get('max')           # 章节最大页数
-        key = body.get('key')           # 加密key
+    def _reserve(cid, chapter, timeout):
+        """预留上传章节, 短事务, 返回漫画与预留token
+
+        token为预留时间, 回收时新预留时间一定大于原预留的超时时间, 不会重复
+        """
+        now = int(time.time())
+        overtime = now + timeout + convert.CHAPTERTIMEOUT
         session = endpoint_session()
         query = session.query(Comic).filter(Comic.cid == cid).with_for_update()
+        squery = session.query(ChapterUpload).filter(ChapterUpload.cid == cid)
+        abandoned = None
         with session.begin():
             comic = query.one()
-            last = comic.last
-            if last != chapter:
-                raise InvalidArgument('Finish chapter value error')
-            chapters = msgpack.unpackb(comic.chapters)
-            if len(chapters) != (last - 1):
-                LOG.error('Comic chapter is not uploading, do not finish it')
-                raise InvalidArgument('Finish chapter value error')
-            chapters.append([max, key])
-            comic.lastup = int(time.time())
-            comic.chapters = msgpack.packb(chapters)
+            if (comic.last + 1) != chapter:
+                raise InvalidArgument('New chapter value  error')
+            upload = squery.one_or_none()
+            if upload:
+                if upload.overtime > now:
+                    LOG.error('Comic chapter is uploading')
+                    raise InvalidArgument('Comic chapter is uploading')
+                # 上传被放弃, 回收预留
+                LOG.warning('Chapter %d.%d upload abandoned, reserve again' % (cid, upload.chapter))
+                abandoned = (upload.chapter, upload.time)
+                upload.chapter = chapter
+                upload.time = now
+                upload.overtime = overtime
+            else:
+                session.add(ChapterUpload(cid=cid, chapter=chapter, time=now, overtime=overtime))
             session.flush()
-            return comic
+        LOG.info('Chapter %d.%d reserved' % (cid, chapter))
+        if abandoned:
+            for path in (ComicRequest.staging_path(cid, *abandoned), ComicRequest.chapter_path(cid, abandoned[0])):
+                if os.path.exists(path):
+                    LOG.warning('Remove abandoned chapter path %s' % path)
+                    shutil.rmtree(path)
+        return comic, now
 
     @staticmethod
-    def _unfinish(cid, chapter):
-        """章节上传完成 失败, 通知还原"""
+    def _reserved(upload, chapter, token):
+        return upload is not None and upload.chapter == chapter and upload.time == token
+
+    @staticmethod
+    def _publish(cid, chapter, token, staging_path):
+        """staging目录rename到章节目录, 锁定漫画后确认预留没有被回收"""
         session = endpoint_session()
         query = session.query(Comic).filter(Comic.cid == cid).with_for_update()
+        squery = session.query(ChapterUpload).filter(ChapterUpload.cid == cid)
         with session.begin():
-            comic = query.one()
-            last = comic.last
-            if last != chapter:
-                raise InvalidArgument('Unfinish chapter value error')
-            chapters = msgpack.unpackb(comic.chapters)
-            if len(chapters) != (last - 1):
-                LOG.error('Comic chapters is not uploading')
-                raise InvalidArgument('Unfinish chapter value error')
-            comic.last = last - 1
-            session.flush()
-        chapter_path = ComicRequest.chapter_path(cid, chapter)
-        LOG.error('Chapter %d.%d unfinish success, try remove chapter path' % (cid, chapter))
+            query.one()
+            if not ComicRequest._reserved(squery.one_or_none(), chapter, token):
+                LOG.error('Chapter %d.%d reserve lost, do not publish it' % (cid, chapter))
+                raise InvalidArgument('Chapter reserve lost')
+            os.rename(staging_path, ComicRequest.chapter_path(cid, chapter))
+
+    @staticmethod
+    def _gc_staging():
+        """清理没有上传预留的staging目录与上传文件"""
+        now = int(time.time())
+        session = endpoint_session(readonly=True)
+        query = model_query(session, ChapterUpload.cid, filter=ChapterUpload.overtime > now)
+        uploading = set(upload.cid for upload in query)
+        for name in os.listdir(ComicRequest.stagingdir):
+            try:
+                cid = int(name.split('.')[0])
+            except ValueError:
+                continue
+            if cid in uploading:
+                continue
+            path = os.path.join(ComicRequest.stagingdir, name)
+            try:
+                if now - os.path.getmtime(path) < STAGINGGRACE:
+                    continue
+                LOG.warning('Remove stale staging %s' % path)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except (OSError, IOError):
+                continue
+
+    @staticmethod
+    def _finish(cid, chapter, token, body):
+        """章节上传完成 通知开放"""
+        max = body.get('max')           # 章节最大页数
+        key = body.get('key')           # 加密key
+        renditions = body.get('renditions')     # 额外尺寸
+        size = body.get('bytes', 0)             # 章节文件总大小
+        session = endpoint_session()
+        query = session.query(Comic).filter(Comic.cid == cid).with_for_update()
+        squery = session.query(ChapterUpload).filter(ChapterUpload.cid == cid)
+        owned = False
         try:
-            shutil.rmtree(chapter_path)
-        except (OSError, IOError):
-            LOG.error('Api _unfinsh Remove chapter path %s fail' % chapter_path)
+            with session.begin():
+                comic = query.one()
+                upload = squery.one_or_none()
+                if not ComicRequest._reserved(upload, chapter, token):
+                    LOG.error('Comic chapter is not uploading, do not finish it')
+                    raise InvalidArgument('Finish chapter value error')
+                owned = True
+                last = comic.last
+                if (last + 1) != chapter:
+                    raise InvalidArgument('Finish chapter value error')
+                chapters = msgpack.unpackb(comic.chapters)
+                if len(chapters) != last:
+                    LOG.error('Comic chapters not match last chapter, do not finish it')
+                    raise InvalidArgument('Finish chapter value error')
+                chapters.append(chapter_info(max, key, renditions, size))
+                comic.last = chapter
+                comic.lastup = int(time.time())
+                comic.chapters = msgpack.packb(chapters)
+                session.delete(upload)
+                session.flush()
+        except Exception:
+            # 预留已被回收时进度属于新的上传, 不修改
+            if owned:
+                PROGRESS.stage(cid, chapter, chapter_progress.FAILED, error='finish chapter fail')
+            raise
+        PROGRESS.stage(cid, chapter, chapter_progress.FINISHED)
         return comic
 
+    @staticmethod
+    def _unfinish(cid, chapter, token, remove=True, error=None):
+        """章节上传完成 失败, 释放预留
+
+        只有删除了自己的预留才清理目录与存储, 预留已被回收时目录属于新的上传
+        """
+        session = endpoint_session()
+        query = session.query(ChapterUpload).filter(and_(ChapterUpload.cid == cid,
+                                                         ChapterUpload.chapter == chapter,
+                                                         ChapterUpload.time == token))
+        with session.begin():
+            count = query.delete()
+        if count != 1:
+            LOG.warning('Chapter %d.%d reserve not found, reserved at %d' % (cid, chapter, token))
+            return
+        PROGRESS.stage(cid, chapter, chapter_progress.FAILED, error=error or 'unfinish')
+        if not remove:
+            return
+        LOG.error('Chapter %d.%d unfinish success, try remove chapter path' % (cid, chapter))
+        for path in (ComicRequest.staging_path(cid, chapter, token), ComicRequest.chapter_path(cid, chapter)):
+            if not os.path.exists(path):
+                continue
+            try:
+                shutil.rmtree(path)
+            except (OSError, IOError):
+                LOG.error('Api _unfinsh Remove chapter path %s fail' % path)
+        try:
+            tpool.execute(STORAGE.delete, storage.chapter_key(cid, chapter))
+        except Exception:
+            LOG.error('Api _unfinsh remove chapter %d.%d from storage fail' % (cid, chapter))
+
     # @verify(manager=True)
     # def finished(self, req, cid, chapter, body=None):
     #     """章节上传完成 通知开放"""
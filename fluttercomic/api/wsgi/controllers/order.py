@@ -19,6 +19,7 @@ from goperation.manager.exceptions import TokenError
 from goperation.manager import common as manager_common
 from goperation.manager.utils import resultutils
 
+from fluttercomic import common
 from fluttercomic.api import endpoint_session
 from fluttercomic.api.wsgi.token import verify
 from fluttercomic.api.wsgi.token import M
@@ -77,10 +78,13 @@ class OrderRequest(MiddlewareContorller):
         sandbox = int(body.pop('sandbox', False))
         platform = body.pop('platform', None)
         oid = body.pop('oid', None)
+        state = body.pop('state', None)
 
         filters = [Order.sandbox == sandbox]
         if platform:
             filters.insert(0, Order.platform == platform)
+        if state is not None:
+            filters.insert(0, Order.state == int(state))
         if oid:
             filters.insert(0, Order.oid < oid)
         filters = filters[0] if len(filters) == 1 else and_(*filters)
@@ -95,6 +99,7 @@ class OrderRequest(MiddlewareContorller):
                                                      Order.money,
                                                      Order.platform,
                                                      Order.time,
+                                                     Order.state,
                                                      ],
                                             counter=Order.oid,
                                             order=Order.oid, desc=True,
@@ -126,6 +131,7 @@ class OrderRequest(MiddlewareContorller):
                                            time=order.time,
                                            cid=order.cid,
                                            chapter=order.chapter,
+                                           state=common.ORDER_STATES[order.state],
                                            ext=jsonutils.loads_as_bytes(order.ext) if order.ext else None,
                                        )
                                    ])
@@ -85,6 +85,20 @@ OVERTIMESCHEMA = {
          }
 }
 
+def history_range(body):
+    """查询时间范围[start, end), 时间戳
+
+    默认不限制开始时间, 返回全部记录; 客户端传入start时按time分区表只扫描对应分区
+    """
+    try:
+        end = int(body.get('end') or time.time() + 1)
+        start = int(body.get('start') or 0)
+    except (TypeError, ValueError):
+        raise InvalidArgument('History start or end time error')
+    if start < 0 or start >= end:
+        raise InvalidArgument('History start time must less then end time')
+    return start, end
+
 
 @singleton.singleton
 class UserRequest(MiddlewareContorller):
@@ -228,6 +242,7 @@ class UserRequest(MiddlewareContorller):
                                            time=order.time,
                                            cid=order.cid,
                                            chapter=order.chapter,
+                                           state=common.ORDER_STATES[order.state],
                                            ext=jsonutils.loads_as_bytes(order.ext) if order.ext else None,
                                        ) for order in query
                                    ])
@@ -237,8 +252,11 @@ class UserRequest(MiddlewareContorller):
         """用户订单列表"""
         body = body or {}
         uid = int(uid)
+        start, end = history_range(body)
         session = endpoint_session(readonly=True)
-        query = model_query(session, RechargeLog, filter=RechargeLog.uid == uid)
+        query = model_query(session, RechargeLog, filter=and_(RechargeLog.uid == uid,
+                                                              RechargeLog.time >= start,
+                                                              RechargeLog.time < end))
         query = query.order_by(RechargeLog.oid.desc())
         return resultutils.results(result='show user recharge log success',
                                    data=[
@@ -266,8 +284,11 @@ class UserRequest(MiddlewareContorller):
         body = body or {}
         uid = int(uid)
         desc = body.get('desc', True)
+        start, end = history_range(body)
         session = endpoint_session(readonly=True)
-        query = model_query(session, UserPayLog, filter=UserPayLog.uid == uid)
+        query = model_query(session, UserPayLog, filter=and_(UserPayLog.uid == uid,
+                                                             UserPayLog.time >= start,
+                                                             UserPayLog.time < end))
         query = query.order_by(UserPayLog.time.desc() if desc else UserPayLog.time)
         return resultutils.results(result='list users paylogs success',
                                    data=[dict(cid=paylog.cid, chapter=paylog.chapter,
@@ -0,0 +1,98 @@
+# -*- coding:utf-8 -*-
+"""章节上传转换进度, 只保存在当前进程内存中
+
+转换进度回调在原生线程(tpool)中执行, 这里只修改数据不使用协程对象
+长轮询在请求协程中定时检查版本号, 不查询数据库
+"""
+import time
+import eventlet
+
+UPLOADING = 'uploading'
+EXTRACTING = 'extracting'
+CONVERTING = 'converting'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+DONE = frozenset([FINISHED, FAILED])
+
+
+class ChapterProgress(object):
+
+    __slots__ = ('cid', 'chapter', 'stage', 'done', 'total', 'error', 'version', 'time')
+
+    def __init__(self, cid, chapter, stage):
+        self.cid = cid
+        self.chapter = chapter
+        self.stage = stage
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.version = 0
+        self.time = time.time()
+
+    def update(self, stage=None, done=None, total=None, error=None):
+        if stage is not None:
+            self.stage = stage
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+        if error is not None:
+            self.error = error
+        self.version += 1
+        self.time = time.time()
+
+    def to_dict(self):
+        return dict(cid=self.cid, chapter=self.chapter, stage=self.stage,
+                    done=self.done, total=self.total, error=self.error,
+                    version=self.version, time=int(self.time))
+
+
+class ProgressRegistry(object):
+
+    def __init__(self, keep=600, stale=7200, interval=0.5):
+        self.keep = keep            # 完成或失败后保留时间
+        self.stale = stale          # 未完成但长时间没有更新
+        self.interval = interval    # 长轮询检查间隔
+        self.chapters = {}
+
+    def _expire(self, now):
+        for key, progress in self.chapters.items():
+            overtime = self.keep if progress.stage in DONE else self.stale
+            if now - progress.time > overtime:
+                del self.chapters[key]
+
+    def start(self, cid, chapter, stage=UPLOADING):
+        self._expire(time.time())
+        progress = ChapterProgress(cid, chapter, stage)
+        self.chapters[(cid, chapter)] = progress
+        return progress
+
+    def get(self, cid, chapter):
+        return self.chapters.get((cid, chapter))
+
+    def stage(self, cid, chapter, stage, error=None):
+        progress = self.get(cid, chapter)
+        if progress:
+            progress.update(stage=stage, error=error)
+
+    def callback(self, cid, chapter):
+        """转换进度回调"""
+        progress = self.get(cid, chapter)
+
+        def _progress(done, total):
+            if progress:
+                progress.update(done=done, total=total)
+
+        return _progress
+
+    def wait(self, cid, chapter, version, timeout):
+        """进度版本号变化, 完成或超时后返回"""
+        deadline = time.time() + timeout
+        while True:
+            progress = self.get(cid, chapter)
+            if progress is None or progress.version != version or progress.stage in DONE:
+                return progress
+            if time.time() >= deadline:
+                return progress
+            eventlet.sleep(self.interval)
@@ -63,6 +63,11 @@ class ComicPrivateRouters(router.ComposableRouter):
                        controller=comic_controller, action='buy',
                        conditions=dict(method=['POST']))
 
+        mapper.connect('chapter_pages',
+                       '/%s/private/comic/{cid}/chapter/{chapter}/user/{uid}' % common.NAME,
+                       controller=comic_controller, action='pages',
+                       conditions=dict(method=['GET']))
+
         mapper.connect('new_chapters',
                        '/%s/private/comic/{cid}/chapters/{chapter}' % common.NAME,
                        controller=comic_controller, action='new',
@@ -72,6 +77,11 @@ class ComicPrivateRouters(router.ComposableRouter):
                        '/%s/private/comic/{cid}/chapters/{chapter}' % common.NAME,
                        controller=comic_controller, action='finished',
                        conditions=dict(method=['GET']))
+
+        mapper.connect('chapter_progress',
+                       '/%s/private/comic/{cid}/chapters/{chapter}/progress' % common.NAME,
+                       controller=comic_controller, action='progress',
+                       conditions=dict(method=['GET']))
         #
         # mapper.connect('new_chapters',
         #                '/%s/private/comic/{cid}/chapters/{chapter}' % common.NAME,
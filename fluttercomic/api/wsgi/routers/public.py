@@ -32,6 +32,11 @@ class ComicPublicRouters(router.ComposableRouter):
     def add_routes(self, mapper):
 
         comic_controller = controller_return_response(comic.ComicRequest(), comic.FAULT_MAP)
+        mapper.connect('hot_comics',
+                       '/%s/public/hot/comics' % common.NAME,
+                       controller=comic_controller, action='hot',
+                       conditions=dict(method=['GET']))
+
         mapper.collection(collection_name='comics',
                           resource_name='comic',
                           controller=comic_controller,
@@ -40,6 +45,11 @@ class ComicPublicRouters(router.ComposableRouter):
                           collection_actions=['index'],
                           member_actions=['show'])
 
+        mapper.connect('chapter_meta',
+                       '/%s/public/comic/{cid}/chapters/{chapter}/meta' % common.NAME,
+                       controller=comic_controller, action='meta',
+                       conditions=dict(method=['GET']))
+
 
 @singleton.singleton
 class ManagerPublicRouters(router.ComposableRouter):
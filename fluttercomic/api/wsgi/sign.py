@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+"""章节图片url签名, 与nginx secure_link模块兼容
+
+nginx配置
+
+    location /cdn/ {
+        secure_link $arg_md5,$arg_expires;
+        secure_link_md5 "$secure_link_expires$uri$arg_uid $secret";
+        if ($secure_link = "") { return 403; }
+        if ($secure_link = "0") { return 410; }
+    }
+
+token为 base64url(md5(expires + uri + uid + ' ' + secret)), 去掉末尾=
+nginx的secure_link_md5只支持md5, 所以不使用hmac
+"""
+import time
+import base64
+import hashlib
+
+
+class PageSigner(object):
+
+    def __init__(self, secret, prefix='/cdn', expires=600):
+        if not secret:
+            raise ValueError('Page signer need secret')
+        self.secret = secret
+        self.prefix = prefix.rstrip('/')
+        self.expires = expires
+
+    @staticmethod
+    def _token(md5):
+        return base64.urlsafe_b64encode(md5.digest()).rstrip('=')
+
+    def _tail(self, uid):
+        return '%d %s' % (uid, self.secret)
+
+    def deadline(self, now=None):
+        return int(now or time.time()) + self.expires
+
+    def chapter_uri(self, cid, chapter):
+        return '%s/%d/%d/' % (self.prefix, cid, chapter)
+
+    def sign(self, uri, uid, expires):
+        md5 = hashlib.md5('%d%s' % (expires, uri))
+        md5.update(self._tail(uid))
+        return self._token(md5)
+
+    def url(self, uri, uid, expires):
+        return '%s?md5=%s&expires=%d&uid=%d' % (uri, self.sign(uri, uid, expires), expires, uid)
+
+    def verify(self, uri, uid, token, expires, now=None):
+        if int(expires) < int(now or time.time()):
+            return False
+        return self.sign(uri, int(uid), int(expires)) == token
+
+    def chapter(self, cid, chapter, count, ext, uid, size=None, expires=None):
+        """一次签名章节所有图片, 共用前缀的md5状态"""
+        expires = expires or self.deadline()
+        base = self.chapter_uri(cid, chapter)
+        prefix = hashlib.md5('%d%s' % (expires, base))
+        tail = self._tail(uid)
+        query = '&expires=%d&uid=%d' % (expires, uid)
+        fmt = '%d_' + size + '.' + ext if size else '%d.' + ext
+        urls = []
+        for page in xrange(1, count + 1):
+            name = fmt % page
+            md5 = prefix.copy()
+            md5.update(name)
+            md5.update(tail)
+            urls.append(base + name + '?md5=' + self._token(md5) + query)
+        return urls
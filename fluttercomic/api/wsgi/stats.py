@@ -0,0 +1,141 @@
+# -*- coding:utf-8 -*-
+"""漫画访问与购买计数
+
+计数只在内存中累加, 定时批量upsert到ComicStat的小时与天统计行
+热门列表从统计表汇总后缓存, 缓存期内不查询数据库
+"""
+import time
+import eventlet
+import sqlalchemy as sa
+
+from simpleutil.log import log as logging
+
+from fluttercomic import common
+from fluttercomic.models import Comic
+from fluttercomic.models import ComicStat
+
+LOG = logging.getLogger(__name__)
+
+HOUR = 0
+DAY = 1
+
+PERIODS = {
+    'hour': (HOUR, 3600, 24),       # 最近24小时
+    'day': (DAY, 86400, 7),         # 最近7天
+}
+
+# 一次购买相当于的访问次数
+BUYWEIGHT = 10
+# 热门列表最多数量
+MAXHOT = 50
+# flush失败后保留的最多漫画数量
+MAXPENDING = 100000
+
+UPSERT = 'INSERT INTO %s (cid, period, bucket, views, buys) ' \
+         'VALUES (:cid, :period, :bucket, :views, :buys) ' \
+         'ON DUPLICATE KEY UPDATE views = views + VALUES(views), buys = buys + VALUES(buys)' \
+         % ComicStat.__table__.name
+
+
+def bucket(now, seconds):
+    return int(now) // seconds * seconds
+
+
+class ComicCounter(object):
+
+    def __init__(self, session, interval=5):
+        self.session = session
+        self.interval = interval
+        self.counts = {}
+        self.worker = None
+
+    def _incr(self, cid, index):
+        counts = self.counts.get(cid)
+        if counts is None:
+            counts = self.counts[cid] = [0, 0]
+        counts[index] += 1
+        if self.worker is None:
+            self.worker = eventlet.spawn_n(self._loop)
+
+    def view(self, cid):
+        self._incr(cid, 0)
+
+    def buy(self, cid):
+        self._incr(cid, 1)
+
+    @staticmethod
+    def rows(counts, now):
+        hour = bucket(now, 3600)
+        day = bucket(now, 86400)
+        rows = []
+        for cid, (views, buys) in counts.iteritems():
+            rows.append(dict(cid=cid, period=HOUR, bucket=hour, views=views, buys=buys))
+            rows.append(dict(cid=cid, period=DAY, bucket=day, views=views, buys=buys))
+        return rows
+
+    def flush(self):
+        if not self.counts:
+            return 0
+        counts, self.counts = self.counts, {}
+        session = self.session()
+        try:
+            with session.begin():
+                session.execute(sa.text(UPSERT), self.rows(counts, time.time()))
+        except Exception:
+            LOG.exception('Flush comic counters fail')
+            # 失败的计数合并回去, 下次再写
+            if len(self.counts) < MAXPENDING:
+                for cid, (views, buys) in counts.iteritems():
+                    _counts = self.counts.setdefault(cid, [0, 0])
+                    _counts[0] += views
+                    _counts[1] += buys
+            return 0
+        return len(counts)
+
+    def _loop(self):
+        while True:
+            eventlet.sleep(self.interval)
+            self.flush()
+
+
+class HotComics(object):
+
+    def __init__(self, session, expire=60):
+        self.session = session
+        self.expire = expire
+        self.cache = {}
+
+    def _query(self, period, now):
+        _period, seconds, count = PERIODS[period]
+        start = bucket(now, seconds) - seconds * (count - 1)
+        session = self.session(readonly=True)
+        score = sa.func.sum(ComicStat.views + ComicStat.buys * BUYWEIGHT).label('score')
+        query = session.query(ComicStat.cid, score,
+                              sa.func.sum(ComicStat.views), sa.func.sum(ComicStat.buys))
+        query = query.filter(ComicStat.period == _period, ComicStat.bucket >= start)
+        query = query.group_by(ComicStat.cid).order_by(score.desc()).limit(MAXHOT)
+        stats = query.all()
+        if not stats:
+            return []
+        query = session.query(Comic.cid, Comic.name, Comic.author, Comic.type,
+                              Comic.region, Comic.last, Comic.lastup, Comic.ext)
+        query = query.filter(Comic.cid.in_([stat[0] for stat in stats]), Comic.status == common.ACTIVE)
+        comics = dict((comic.cid, comic) for comic in query)
+        hots = []
+        for cid, score, views, buys in stats:
+            comic = comics.get(cid)
+            if not comic:
+                continue
+            hots.append(dict(cid=cid, name=comic.name, author=comic.author, type=comic.type,
+                             region=comic.region, last=comic.last, lastup=comic.lastup, ext=comic.ext,
+                             views=int(views), buys=int(buys)))
+        return hots
+
+    def get(self, period, limit=MAXHOT):
+        now = time.time()
+        cached = self.cache.get(period)
+        if cached and cached[0] > now:
+            return cached[1][:limit]
+        hots = self._query(period, now)
+        self.cache[period] = (now + self.expire, hots)
+        return hots[:limit]
@@ -1,10 +1,41 @@
 import msgpack
 
 
-def format_chapters(point, chapters, payed=0):
+def entitled(point, chapter, payed=0):
+    """free chapter or payed chapter"""
+    return chapter < point or chapter <= payed
 
+
+def chapter_info(max, key, renditions=None, size=0):
+    """chapter info is [max, key], [max, key, renditions] or [max, key, renditions, bytes]"""
+    info = [max, key]
+    if renditions or size:
+        info.append(renditions or [])
+    if size:
+        info.append(size)
+    return info
+
+
+def chapter_bytes(info):
+    return info[3] if len(info) > 3 else 0
+
+
+def format_chapters(point, chapters, payed=0, keys=True):
     chapters = msgpack.unpackb(chapters)
     return [dict(index=index+1,
                  max=c[0],
-                 key=c[1] if (index+1 < point or index+1 <= payed) else '')
-            for index, c in enumerate(chapters)]
\ No newline at end of file
+                 key=c[1] if (keys and (index+1 < point or index+1 <= payed)) else '',
+                 renditions=c[2] if len(c) > 2 else [],
+                 bytes=chapter_bytes(c))
+            for index, c in enumerate(chapters)]
+
+
+def prefetch_chapters(point, chapters, start, count, payed=0):
+    """entitled chapters from start, stop at first not entitled chapter"""
+    chapters = msgpack.unpackb(chapters)
+    infos = []
+    for chapter in xrange(max(start, 1), min(start + count, len(chapters) + 1)):
+        if not entitled(point, chapter, payed):
+            break
+        infos.append((chapter, chapters[chapter - 1]))
+    return infos
\ No newline at end of file
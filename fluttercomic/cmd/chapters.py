@@ -0,0 +1,264 @@
+# -*- coding:utf-8 -*-
+"""离线批量导入漫画章节
+
+源目录下每个子目录为一个章节, 目录名为章节号, 必须从漫画最后章节+1开始连续
+导入期间持有last+1章节的上传预留, API不能同时上传新章节
+所有章节并行转换到staging, 全部成功后锁定漫画, 在一个事务中移动到cdn并写入章节信息
+"""
+import os
+import time
+import random
+import string
+import shutil
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import msgpack
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from simpleutil.config import cfg
+from simpleutil.config import types
+from simpleutil.log import log as logging
+
+from fluttercomic import common
+from fluttercomic.models import Comic
+from fluttercomic.models import ChapterUpload
+from fluttercomic.api.wsgi.utils import chapter_info
+from fluttercomic.plugin import convert
+from fluttercomic.plugin import storage
+from fluttercomic.plugin.convert import pages
+
+LOG = logging.getLogger(__name__)
+
+
+import_opts = [
+    cfg.StrOpt('connection',
+               required=True,
+               help='The SQLAlchemy connection string of fluttercomic database'),
+    cfg.IntOpt('cid',
+               required=True,
+               help='Comic id'),
+    cfg.StrOpt('path',
+               required=True,
+               help='Source path, each sub folder is a chapter named by chapter number'),
+    cfg.StrOpt('basedir',
+               default='/data/www/fluttercomic',
+               help='Comic file base dir'),
+    cfg.StrOpt('storage',
+               default='local',
+               choices=['local', 's3'],
+               help='Converted img storage, the same as api, s3 options in [fluttercomic.s3] of config file'),
+    cfg.IntOpt('processes',
+               default=max(1, multiprocessing.cpu_count() // 2),
+               help='Chapters convert at same time, every convert use two cores'),
+    cfg.StrOpt('size',
+               default='1200x900',
+               choices=common.SIZES,
+               help='Chapter img size'),
+    cfg.ListOpt('renditions',
+                default=[],
+                item_type=types.String(choices=common.SIZES),
+                help='Chapter img extra sizes'),
+    cfg.IntOpt('maxsize',
+               default=250000,
+               help='Chapter img file size'),
+    cfg.StrOpt('order',
+               default=pages.NATURAL,
+               help='img file order rule'),
+    cfg.BoolOpt('strict',
+                default=True,
+                help='Stop import when a file not img file'),
+]
+
+
+def find_chapters(path, last):
+    """源目录中的章节, 返回[(chapter, path)]"""
+    chapters = []
+    for name in os.listdir(path):
+        src = os.path.join(path, name)
+        if not os.path.isdir(src):
+            LOG.warning('%s is not folder, skip it' % src)
+            continue
+        try:
+            chapters.append((int(name), src))
+        except ValueError:
+            raise ValueError('Chapter folder name %s is not int' % name)
+    chapters.sort()
+    if not chapters:
+        raise ValueError('No chapter found in %s' % path)
+    for index, (chapter, src) in enumerate(chapters):
+        if chapter != last + index + 1:
+            raise ValueError('Chapter %d not continuous, comic last chapter is %d' % (chapter, last))
+    if chapters[-1][0] > common.MAXCHAPTERS:
+        raise ValueError('Chapter over %d' % common.MAXCHAPTERS)
+    return chapters
+
+
+def copy_chapter(src, dst, order):
+    """按页序复制到章节目录"""
+    files = [name for name in os.listdir(src) if os.path.isfile(os.path.join(src, name))]
+    if not files:
+        raise ValueError('No file in path %s' % src)
+    if len(files) > common.MAXCHAPTERPIC:
+        raise ValueError('Chapter img count over size in %s' % src)
+    os.makedirs(dst, 0o755)
+    for index, filename in enumerate(pages.sort_pages(files, order)):
+        ext = os.path.splitext(filename)[1].lower()
+        shutil.copyfile(os.path.join(src, filename), os.path.join(dst, '%03d%s' % (index + 1, ext)))
+
+
+class ChapterImporter(object):
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.cid = conf.cid
+        self.comic_path = os.path.join(conf.basedir, 'cdn', str(conf.cid))
+        self.logdir = os.path.join(conf.basedir, 'log')
+        self.stagingdir = os.path.join(conf.basedir, 'staging')
+        self.storage = storage.load(conf.storage, conf.basedir)
+        engine = sa.create_engine(conf.connection)
+        self.session = orm.sessionmaker(bind=engine, autocommit=True)()
+
+    def _staging(self, chapter):
+        return os.path.join(self.stagingdir, 'import.%d.%d' % (self.cid, chapter))
+
+    def _chapter_path(self, chapter):
+        return os.path.join(self.comic_path, str(chapter))
+
+    def _convert(self, chapter, src, ext):
+        staging = self._staging(chapter)
+        key = ''.join(random.sample(string.lowercase, 6))
+        logfile = os.path.join(self.logdir, '%d.import.%d.%d.log' % (int(time.time()), self.cid, chapter))
+        LOG.info('Convert chapter %d from %s' % (chapter, src))
+        copy_chapter(src, staging, self.conf.order)
+
+        def _progress(done, total):
+            LOG.debug('Chapter %d convert progress %d/%d' % (chapter, done, total))
+
+        job = convert.convert_chapter(dst=staging, ext=ext, key='%d%s' % (self.cid, key),
+                                      strict=self.conf.strict, size=self.conf.size,
+                                      maxsize=self.conf.maxsize, order=self.conf.order,
+                                      renditions=self.conf.renditions, logfile=logfile,
+                                      progress=_progress)
+        count = convert.count_pages(staging, ext)
+        if not count:
+            raise ValueError('No page converted in chapter %d' % chapter)
+        size = sum(convert.page_sizes(staging, ext, count))
+        # 提交前发布, 章节开放时存储中已经有文件
+        files = self.storage.publish(storage.chapter_key(self.cid, chapter), path=staging)
+        LOG.info('Chapter %d publish %d files to %s storage' % (chapter, files, self.conf.storage))
+        LOG.info('Chapter %d converted, %d pages %d bytes, cpu time %.2fs' %
+                 (chapter, count, size, job.utime + job.stime))
+        return chapter_info(count, key, self.conf.renditions, size)
+
+    def _reserve(self, last, count):
+        """预留last+1章节, 超时按每批章节一次转换超时计算, 返回预留token"""
+        now = int(time.time())
+        batches = (count + self.conf.processes - 1) // self.conf.processes
+        overtime = now + (batches + 1) * convert.CHAPTERTIMEOUT
+        query = self.session.query(Comic).filter(Comic.cid == self.cid).with_for_update()
+        squery = self.session.query(ChapterUpload).filter(ChapterUpload.cid == self.cid)
+        with self.session.begin():
+            comic = query.one()
+            if comic.last != last:
+                raise ValueError('Comic chapters changed before import')
+            upload = squery.one_or_none()
+            if upload:
+                if upload.overtime > now:
+                    raise ValueError('Comic chapter is uploading')
+                LOG.warning('Chapter %d.%d upload abandoned, reserve for import' % (self.cid, upload.chapter))
+                upload.chapter = last + 1
+                upload.time = now
+                upload.overtime = overtime
+            else:
+                self.session.add(ChapterUpload(cid=self.cid, chapter=last + 1, time=now, overtime=overtime))
+        return now
+
+    def _release(self, last, token):
+        query = self.session.query(ChapterUpload).filter(sa.and_(ChapterUpload.cid == self.cid,
+                                                                 ChapterUpload.chapter == last + 1,
+                                                                 ChapterUpload.time == token))
+        with self.session.begin():
+            count = query.delete()
+        if count != 1:
+            LOG.warning('Import reserve of comic %d not found' % self.cid)
+        return count == 1
+
+    def _commit(self, last, token, infos):
+        """锁定漫画确认预留后移动章节目录, 提交失败时删除已移动的目录"""
+        query = self.session.query(Comic).filter(Comic.cid == self.cid).with_for_update()
+        squery = self.session.query(ChapterUpload).filter(ChapterUpload.cid == self.cid)
+        renamed = []
+        try:
+            with self.session.begin():
+                comic = query.one()
+                upload = squery.one_or_none()
+                if not upload or upload.chapter != last + 1 or upload.time != token:
+                    raise ValueError('Import reserve lost, reserve overtime?')
+                chapters = msgpack.unpackb(comic.chapters)
+                if comic.last != last or len(chapters) != last:
+                    raise ValueError('Comic chapters changed while importing')
+                for chapter in xrange(last + 1, last + len(infos) + 1):
+                    os.rename(self._staging(chapter), self._chapter_path(chapter))
+                    renamed.append(chapter)
+                chapters.extend(infos)
+                comic.chapters = msgpack.packb(chapters)
+                comic.last = last + len(infos)
+                comic.lastup = int(time.time())
+                self.session.delete(upload)
+        except Exception:
+            for chapter in renamed:
+                shutil.rmtree(self._chapter_path(chapter))
+            raise
+
+    def run(self):
+        comic = self.session.query(Comic).filter(Comic.cid == self.cid).one()
+        chapters = msgpack.unpackb(comic.chapters)
+        if len(chapters) != comic.last:
+            raise ValueError('Comic chapters not match last chapter')
+        if not os.path.exists(self.comic_path):
+            if self.storage.LOCAL:
+                raise ValueError('Comic path %s not exist' % self.comic_path)
+            os.makedirs(self.comic_path, 0o755)
+        last = comic.last
+        ext = comic.ext
+        sources = find_chapters(self.conf.path, last)
+        for path in (self.logdir, self.stagingdir):
+            if not os.path.exists(path):
+                os.makedirs(path, 0o755)
+
+        token = self._reserve(last, len(sources))
+        pool = None
+        try:
+            for chapter, src in sources:
+                if os.path.exists(self._chapter_path(chapter)):
+                    raise ValueError('Chapter path of %d alreday exist' % chapter)
+                if os.path.exists(self._staging(chapter)):
+                    shutil.rmtree(self._staging(chapter))
+            LOG.info('Import %d chapters of comic %d with %d processes' %
+                     (len(sources), self.cid, self.conf.processes))
+            start = time.time()
+            pool = ThreadPool(self.conf.processes)
+            results = [pool.apply_async(self._convert, (chapter, src, ext)) for chapter, src in sources]
+            pool.close()
+            infos = [result.get() for result in results]
+            pool.join()
+            self._commit(last, token, infos)
+        except Exception:
+            if pool:
+                pool.terminate()
+                pool.join()
+            for chapter, src in sources:
+                if os.path.exists(self._staging(chapter)):
+                    shutil.rmtree(self._staging(chapter))
+            # 预留已被回收时存储中的章节可能属于新的上传
+            if self._release(last, token) and not self.storage.LOCAL:
+                for chapter, src in sources:
+                    try:
+                        self.storage.delete(storage.chapter_key(self.cid, chapter))
+                    except Exception:
+                        LOG.error('Remove chapter %d from storage fail' % chapter)
+            raise
+        LOG.info('Import %d chapters finish, use %d seconds' % (len(infos), int(time.time() - start)))
+        return infos
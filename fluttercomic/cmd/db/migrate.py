@@ -0,0 +1,169 @@
+# -*- coding:utf-8 -*-
+"""在线转换数据表存储引擎
+
+1. 创建同结构的新表并修改引擎
+2. 在原表上创建触发器, 转换期间的写入同步到新表
+3. 按主键分批复制, 新表已存在的行(触发器写入, 更新)跳过
+4. 原子重命名交换新旧表, 删除触发器, 旧表保留为<table>_old
+"""
+import time
+
+import sqlalchemy as sa
+
+from simpleutil.config import cfg
+from simpleutil.log import log as logging
+
+from fluttercomic.models import UserPayLog
+from fluttercomic.models import Order
+from fluttercomic.models import RechargeLog
+from fluttercomic.models import DuplicateRecharge
+
+LOG = logging.getLogger(__name__)
+
+TABLES = [UserPayLog, Order, RechargeLog, DuplicateRecharge]
+
+migrate_opts = [
+    cfg.StrOpt('connection',
+               required=True,
+               help='The SQLAlchemy connection string of fluttercomic database, '
+                    'user need TRIGGER privilege'),
+    cfg.ListOpt('tables',
+                default=[table.__tablename__ for table in TABLES],
+                help='Tables to migrate'),
+    cfg.StrOpt('engine',
+               default='InnoDB',
+               choices=['InnoDB', 'MyISAM'],
+               help='Target storage engine'),
+    cfg.IntOpt('batch',
+               default=2000,
+               min=100, max=100000,
+               help='Rows copied in one batch'),
+    cfg.FloatOpt('sleep',
+                 default=0.05,
+                 min=0,
+                 help='Seconds to sleep between batches, reduce load of online database'),
+    cfg.BoolOpt('drop',
+                default=False,
+                help='Drop old table after swap'),
+]
+
+
+def quote(name):
+    return '`%s`' % name
+
+
+class TableMigrator(object):
+
+    def __init__(self, conn, table, engine, batch, sleep=0):
+        self.conn = conn
+        self.table = table
+        self.name = table.name
+        self.new = '%s_new' % self.name
+        self.old = '%s_old' % self.name
+        self.engine = engine
+        self.batch = batch
+        self.sleep = sleep
+        self.columns = [column.name for column in table.columns]
+        self.keys = [column.name for column in table.primary_key.columns]
+
+    def current(self):
+        return self.conn.execute(sa.text('SELECT ENGINE FROM information_schema.TABLES '
+                                         'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name'),
+                                 name=self.name).scalar()
+
+    def _triggers(self):
+        columns = ', '.join(map(quote, self.columns))
+        new = ', '.join(['NEW.%s' % quote(column) for column in self.columns])
+        where = ' AND '.join(['%s = OLD.%s' % (quote(key), quote(key)) for key in self.keys])
+        replace = 'REPLACE INTO %s (%s) VALUES (%s)' % (quote(self.new), columns, new)
+        return [
+            ('%s_mig_ins' % self.name, 'AFTER INSERT', replace),
+            ('%s_mig_upd' % self.name, 'AFTER UPDATE', replace),
+            ('%s_mig_del' % self.name, 'AFTER DELETE',
+             'DELETE IGNORE FROM %s WHERE %s' % (quote(self.new), where)),
+        ]
+
+    def prepare(self):
+        self.conn.execute('DROP TABLE IF EXISTS %s' % quote(self.new))
+        self.conn.execute('CREATE TABLE %s LIKE %s' % (quote(self.new), quote(self.name)))
+        self.conn.execute('ALTER TABLE %s ENGINE=%s' % (quote(self.new), self.engine))
+        for name, when, action in self._triggers():
+            self.conn.execute('DROP TRIGGER IF EXISTS %s' % quote(name))
+            self.conn.execute('CREATE TRIGGER %s %s ON %s FOR EACH ROW %s' %
+                              (quote(name), when, quote(self.name), action))
+
+    def drop_triggers(self):
+        for name, when, action in self._triggers():
+            self.conn.execute('DROP TRIGGER IF EXISTS %s' % quote(name))
+
+    def copy(self):
+        """按主键顺序分批复制, 返回复制行数"""
+        columns = ', '.join(map(quote, self.columns))
+        keys = ', '.join(map(quote, self.keys))
+        params = ', '.join([':k%d' % index for index in range(len(self.keys))])
+        select = 'SELECT %s FROM %s' % (keys, quote(self.name))
+        first = sa.text('%s ORDER BY %s LIMIT %d' % (select, keys, self.batch))
+        after = sa.text('%s WHERE (%s) > (%s) ORDER BY %s LIMIT %d' %
+                        (select, keys, params, keys, self.batch))
+        insert = 'INSERT IGNORE INTO %s (%s) SELECT %s FROM %s WHERE (%s) >= (%s) AND (%s) <= (%s)'
+        insert = sa.text(insert % (quote(self.new), columns, columns, quote(self.name),
+                                   keys, params, keys, params.replace(':k', ':e')))
+        copied = 0
+        last = None
+        while True:
+            if last is None:
+                rows = self.conn.execute(first).fetchall()
+            else:
+                rows = self.conn.execute(after, **dict(('k%d' % i, v) for i, v in enumerate(last))).fetchall()
+            if not rows:
+                break
+            bounds = dict(('k%d' % i, v) for i, v in enumerate(rows[0]))
+            bounds.update(dict(('e%d' % i, v) for i, v in enumerate(rows[-1])))
+            copied += self.conn.execute(insert, **bounds).rowcount
+            last = tuple(rows[-1])
+            LOG.info('Table %s copied %d rows, last key %s' % (self.name, copied, str(last)))
+            if self.sleep:
+                time.sleep(self.sleep)
+        return copied
+
+    def swap(self, drop=False):
+        self.conn.execute('RENAME TABLE %s TO %s, %s TO %s' %
+                          (quote(self.name), quote(self.old), quote(self.new), quote(self.name)))
+        # 触发器跟随原表改名
+        self.drop_triggers()
+        if drop:
+            self.conn.execute('DROP TABLE %s' % quote(self.old))
+
+    def run(self, drop=False):
+        engine = self.current()
+        if engine is None:
+            raise ValueError('Table %s not exist' % self.name)
+        if engine.lower() == self.engine.lower():
+            LOG.info('Table %s is already %s' % (self.name, engine))
+            return 0
+        LOG.info('Migrate table %s from %s to %s' % (self.name, engine, self.engine))
+        start = time.time()
+        self.prepare()
+        try:
+            copied = self.copy()
+        except Exception:
+            self.drop_triggers()
+            self.conn.execute('DROP TABLE IF EXISTS %s' % quote(self.new))
+            raise
+        self.swap(drop)
+        LOG.info('Migrate table %s finish, %d rows, use %d seconds' %
+                 (self.name, copied, int(time.time() - start)))
+        return copied
+
+
+def migrate(conf):
+    tables = dict((table.__tablename__, table.__table__) for table in TABLES)
+    for name in conf.tables:
+        if name not in tables:
+            raise ValueError('Table %s can not migrate' % name)
+    conn = sa.create_engine(conf.connection).connect()
+    try:
+        for name in conf.tables:
+            TableMigrator(conn, tables[name], conf.engine, conf.batch, conf.sleep).run(conf.drop)
+    finally:
+        conn.close()
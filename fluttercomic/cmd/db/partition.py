@@ -0,0 +1,171 @@
+# -*- coding:utf-8 -*-
+"""支付记录表按月分区与归档
+
+分区名为p<YYYYMM>, 保存该月(UTC)的记录, pmax保存未来数据
+init      已有表修改主键/唯一键包含time并按time分区
+rotate    保证未来ahead个月的分区存在, 需要定时执行
+archive   早于keep个月的分区交换到压缩表<table>_<YYYYMM>后删除分区
+"""
+import time
+import calendar
+
+import sqlalchemy as sa
+
+from simpleutil.config import cfg
+from simpleutil.log import log as logging
+
+from fluttercomic.models import UserPayLog
+from fluttercomic.models import Order
+from fluttercomic.models import RechargeLog
+
+LOG = logging.getLogger(__name__)
+
+TABLES = [UserPayLog, Order, RechargeLog]
+MAXPARTITION = 'pmax'
+
+partition_opts = [
+    cfg.StrOpt('connection',
+               required=True,
+               help='The SQLAlchemy connection string of fluttercomic database'),
+    cfg.StrOpt('action',
+               required=True,
+               choices=['init', 'rotate', 'archive'],
+               help='Partition action'),
+    cfg.ListOpt('tables',
+                default=[table.__tablename__ for table in TABLES],
+                help='Partitioned tables'),
+    cfg.IntOpt('ahead',
+               default=3,
+               min=1, max=24,
+               help='Months of partitions created ahead'),
+    cfg.IntOpt('keep',
+               default=12,
+               min=1,
+               help='Months of partitions keep in table, older partitions are archived'),
+]
+
+
+def add_months(year, month, count):
+    month += count
+    return year + (month - 1) // 12, (month - 1) % 12 + 1
+
+
+def month_of(timestamp):
+    t = time.gmtime(timestamp)
+    return t.tm_year, t.tm_mon
+
+
+def month_start(year, month):
+    return calendar.timegm((year, month, 1, 0, 0, 0))
+
+
+def partition_name(year, month):
+    return 'p%04d%02d' % (year, month)
+
+
+def partition_define(year, month):
+    """分区保存当月数据, 上限为下月开始时间"""
+    return 'PARTITION %s VALUES LESS THAN (%d)' % (partition_name(year, month),
+                                                  month_start(*add_months(year, month, 1)))
+
+
+def partition_month(name):
+    return int(name[1:5]), int(name[5:7])
+
+
+class TablePartition(object):
+
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+        self.name = table.name
+
+    def partitions(self):
+        rows = self.conn.execute(sa.text('SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+                                         'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name '
+                                         'AND PARTITION_NAME IS NOT NULL '
+                                         'ORDER BY PARTITION_ORDINAL_POSITION'), name=self.name)
+        return [row[0] for row in rows]
+
+    def _months(self, first, last):
+        months = []
+        while first <= last:
+            months.append(first)
+            first = add_months(first[0], first[1], 1)
+        return months
+
+    def init(self, ahead, now=None):
+        if self.partitions():
+            LOG.info('Table %s already partitioned' % self.name)
+            return []
+        now = now or int(time.time())
+        oldest = self.conn.execute('SELECT MIN(`time`) FROM `%s`' % self.name).scalar()
+        months = self._months(month_of(oldest or now), add_months(*(month_of(now) + (ahead, ))))
+        keys = ['DROP PRIMARY KEY',
+                'ADD PRIMARY KEY (%s)' % ', '.join(['`%s`' % c.name for c in self.table.primary_key.columns])]
+        for constraint in self.table.constraints:
+            if isinstance(constraint, sa.UniqueConstraint):
+                keys.append('DROP INDEX `%s`' % constraint.name)
+                keys.append('ADD UNIQUE INDEX `%s` (%s)' %
+                            (constraint.name, ', '.join(['`%s`' % c.name for c in constraint.columns])))
+        defines = [partition_define(*month) for month in months]
+        defines.append('PARTITION %s VALUES LESS THAN MAXVALUE' % MAXPARTITION)
+        LOG.info('Partition table %s from %s to %s' % (self.name, partition_name(*months[0]),
+                                                       partition_name(*months[-1])))
+        self.conn.execute('ALTER TABLE `%s` %s PARTITION BY RANGE (`time`) (%s)' %
+                          (self.name, ', '.join(keys), ', '.join(defines)))
+        return [partition_name(*month) for month in months]
+
+    def rotate(self, ahead, now=None):
+        partitions = [name for name in self.partitions() if name != MAXPARTITION]
+        if not partitions:
+            raise ValueError('Table %s not partitioned' % self.name)
+        now = now or int(time.time())
+        last = partition_month(partitions[-1])
+        months = self._months(add_months(last[0], last[1], 1), add_months(*(month_of(now) + (ahead, ))))
+        if not months:
+            return []
+        defines = [partition_define(*month) for month in months]
+        defines.append('PARTITION %s VALUES LESS THAN MAXVALUE' % MAXPARTITION)
+        self.conn.execute('ALTER TABLE `%s` REORGANIZE PARTITION %s INTO (%s)' %
+                          (self.name, MAXPARTITION, ', '.join(defines)))
+        LOG.info('Table %s add partitions to %s' % (self.name, partition_name(*months[-1])))
+        return [partition_name(*month) for month in months]
+
+    def archive(self, keep, now=None):
+        """交换分区到独立的压缩表, 交换只修改元数据, 不复制数据"""
+        now = now or int(time.time())
+        oldest = partition_name(*add_months(*(month_of(now) + (-keep, ))))
+        archived = []
+        for name in self.partitions():
+            if name == MAXPARTITION or name >= oldest:
+                continue
+            target = '%s_%s' % (self.name, name[1:])
+            self.conn.execute('CREATE TABLE `%s` LIKE `%s`' % (target, self.name))
+            self.conn.execute('ALTER TABLE `%s` REMOVE PARTITIONING' % target)
+            self.conn.execute('ALTER TABLE `%s` EXCHANGE PARTITION %s WITH TABLE `%s`' %
+                              (self.name, name, target))
+            self.conn.execute('ALTER TABLE `%s` DROP PARTITION %s' % (self.name, name))
+            self.conn.execute('ALTER TABLE `%s` ROW_FORMAT=COMPRESSED' % target)
+            LOG.info('Table %s partition %s archived to %s' % (self.name, name, target))
+            archived.append(target)
+        return archived
+
+
+def partition(conf):
+    tables = dict((table.__tablename__, table.__table__) for table in TABLES)
+    for name in conf.tables:
+        if name not in tables:
+            raise ValueError('Table %s can not partition' % name)
+    conn = sa.create_engine(conf.connection).connect()
+    try:
+        for name in conf.tables:
+            manager = TablePartition(conn, tables[name])
+            if conf.action == 'init':
+                manager.init(conf.ahead)
+            elif conf.action == 'rotate':
+                manager.rotate(conf.ahead)
+            else:
+                manager.archive(conf.keep)
+    finally:
+        conn.close()
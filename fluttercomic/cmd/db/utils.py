@@ -1,7 +1,65 @@
+from sqlalchemy import create_engine
+
 from simpleservice.ormdb.tools.utils import init_database
 
+from fluttercomic import common
 from fluttercomic.models import TableBase
+from fluttercomic.models import ChapterUpload
+from fluttercomic.models import ComicStat
+from fluttercomic.models import Order
+from fluttercomic.models import OrderSerial
+from fluttercomic.models import RechargeLog
 
 
 def init_fluttercomic(db_info):
     init_database(db_info, TableBase.metadata)
+
+
+def engine(db_info):
+    return create_engine('mysql+mysqldb://%(user)s:%(passwd)s@%(host)s:%(port)s/%(schema)s' % db_info)
+
+
+# tables added after the first release, init_database creates them on new databases
+UPGRADE_TABLES = [ChapterUpload, ComicStat]
+
+
+def upgrade_tables(db_info):
+    """create tables missing in an existing database, existing tables are skipped"""
+    bind = engine(db_info)
+    for table in UPGRADE_TABLES:
+        table.__table__.create(bind=bind, checkfirst=True)
+    return [table.__tablename__ for table in UPGRADE_TABLES]
+
+
+def upgrade_order_state(db_info):
+    """add order state column to an existing database, orders with recharge log are paid
+
+    return the number of paid orders, 0 when the column already exists
+    """
+    order = Order.__tablename__
+    conn = engine(db_info).connect()
+    try:
+        if conn.execute("SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                        "AND TABLE_NAME = '%s' AND COLUMN_NAME = 'state'" % order).scalar():
+            return 0
+        conn.execute('ALTER TABLE `%s` ADD COLUMN `state` TINYINT UNSIGNED NOT NULL DEFAULT %d AFTER `chapter`, '
+                     'ADD INDEX `order_state` (`state`, `time`)' % (order, common.ORDER_CREATED))
+        return conn.execute('UPDATE `%s` o JOIN `%s` r ON r.oid = o.oid SET o.state = %d' %
+                            (order, RechargeLog.__tablename__, common.ORDER_PAID)).rowcount
+    finally:
+        conn.close()
+
+
+def upgrade_order_serial(db_info):
+    """create order serial table and fill it with serials of existing orders
+
+    return the number of serials inserted
+    """
+    bind = engine(db_info)
+    OrderSerial.__table__.create(bind=bind, checkfirst=True)
+    conn = bind.connect()
+    try:
+        return conn.execute('INSERT IGNORE INTO `%s` (`serial`, `oid`) SELECT `serial`, `oid` FROM `%s` '
+                            'WHERE `serial` IS NOT NULL' % (OrderSerial.__tablename__, Order.__tablename__)).rowcount
+    finally:
+        conn.close()
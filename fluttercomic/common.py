@@ -13,5 +13,16 @@ HIDE = 1
 
 NOTCHCEK = 1
 
+# 订单状态
+ORDER_CREATED = 0
+ORDER_PAID = 1
+ORDER_EXPIRED = 2
+ORDER_DUPLICATE = 3
+ORDER_STATES = {ORDER_CREATED: 'created', ORDER_PAID: 'paid',
+                ORDER_EXPIRED: 'expired', ORDER_DUPLICATE: 'duplicate'}
+
 
 IMGEXT = frozenset(['.jpg', '.png', '.bmp', '.jpeg', '.webp'])
+
+# 章节图片可选尺寸, api/导入/转换共用
+SIZES = ['800x600', '1200x900', '1600x1200']
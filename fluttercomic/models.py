@@ -15,7 +15,6 @@ from sqlalchemy.dialects.mysql import BOOLEAN
 
 from simpleservice.ormdb.models import TableBase
 from simpleservice.ormdb.models import InnoDBTableBase
-from simpleservice.ormdb.models import MyISAMTableBase
 
 from simpleutil.utils import uuidutils
 
@@ -90,6 +89,36 @@ class Comic(TableBase):
     )
 
 
+class ChapterUpload(TableBase):
+    """上传中章节, 每个漫画同时只能上传一个章节"""
+    cid = sa.Column(INTEGER(unsigned=True), nullable=False,
+                    primary_key=True)                                           # 漫画ID
+    chapter = sa.Column(SMALLINT(unsigned=True), nullable=False)                # 上传章节
+    time = sa.Column(INTEGER(unsigned=True), nullable=False)                    # 预留时间
+    overtime = sa.Column(INTEGER(unsigned=True), nullable=False)                # 超时时间, 超时后可被回收
+
+    __table_args__ = (
+        InnoDBTableBase.__table_args__
+    )
+
+
+class ComicStat(TableBase):
+    """漫画访问购买统计, 按小时/天汇总"""
+    cid = sa.Column(INTEGER(unsigned=True), nullable=False,
+                    primary_key=True)                                           # 漫画ID
+    period = sa.Column(TINYINT(unsigned=True), nullable=False,
+                       primary_key=True)                                        # 统计周期, 小时/天
+    bucket = sa.Column(INTEGER(unsigned=True), nullable=False,
+                       primary_key=True)                                        # 周期开始时间
+    views = sa.Column(INTEGER(unsigned=True), nullable=False, default=0)        # 访问次数
+    buys = sa.Column(INTEGER(unsigned=True), nullable=False, default=0)         # 购买次数
+
+    __table_args__ = (
+        sa.Index('period_index', 'period', 'bucket'),
+        InnoDBTableBase.__table_args__
+    )
+
+
 class UserBook(TableBase):
     """用户收藏书架"""
     uid = sa.Column(INTEGER(unsigned=True), nullable=False,
@@ -134,10 +163,11 @@ class UserPayLog(TableBase):
     gift = sa.Column(SMALLINT(unsigned=True), nullable=False)                   # 购买用gift
     coins = sa.Column(INTEGER(unsigned=True), nullable=False)                   # 购买时coins(加锁,准确)
     gifts = sa.Column(INTEGER(unsigned=True), nullable=False)                   # 购买时gifts(加锁,准确)
-    time = sa.Column(INTEGER(unsigned=True), nullable=False)                    # 购买时间
+    time = sa.Column(INTEGER(unsigned=True), nullable=False,
+                     primary_key=True)                                          # 购买时间, 按月分区
 
     __table_args__ = (
-        MyISAMTableBase.__table_args__
+        InnoDBTableBase.__table_args__
     )
 
 
@@ -155,16 +185,31 @@ class Order(TableBase):
     currency = sa.Column(VARCHAR(16), nullable=True)                            # 币种
     platform = sa.Column(VARCHAR(32), nullable=True)                            # 订单类型平台
     serial = sa.Column(VARCHAR(128), nullable=True)                             # 流水号
-    time = sa.Column(INTEGER(unsigned=True), nullable=False)                    # 订单时间
+    time = sa.Column(INTEGER(unsigned=True), nullable=False,
+                     primary_key=True)                                          # 订单时间, 按月分区
     cid = sa.Column(INTEGER(unsigned=True), nullable=False, default=0)          # 订单发起时用户所看漫画
     chapter = sa.Column(INTEGER(unsigned=True), nullable=False, default=0)      # 订单发起时用户所需购买章节
+    state = sa.Column(TINYINT(unsigned=True), nullable=False,
+                      default=common.ORDER_CREATED)                             # 订单状态
     ext = sa.Column(BLOB, nullable=True)                                        # 扩展信息
 
     __table_args__ = (
-        sa.UniqueConstraint('serial', name='serial_unique'),
+        sa.UniqueConstraint('serial', 'time', name='serial_unique'),
         sa.Index('type_platform', 'platform'),
         sa.Index('order_uid', 'uid'),
-        MyISAMTableBase.__table_args__
+        sa.Index('order_state', 'state', 'time'),
+        InnoDBTableBase.__table_args__
+    )
+
+
+class OrderSerial(TableBase):
+    """订单流水号, Order按time分区后serial_unique包含time, 由不分区的本表保证流水号唯一"""
+    serial = sa.Column(VARCHAR(128), nullable=False,
+                       primary_key=True)                                        # 流水号
+    oid = sa.Column(BIGINT(unsigned=True), nullable=False)                      # 订单ID
+
+    __table_args__ = (
+        InnoDBTableBase.__table_args__
     )
 
 
@@ -181,7 +226,8 @@ class RechargeLog(TableBase):
     money = sa.Column(INTEGER(unsigned=True), nullable=False)                   # 金钱数量
     currency = sa.Column(VARCHAR(16), nullable=True)                            # 币种
     platform = sa.Column(VARCHAR(32), nullable=True)                            # 订单类型平台
-    time = sa.Column(INTEGER(unsigned=True), nullable=False)                    # 订单时间
+    time = sa.Column(INTEGER(unsigned=True), nullable=False,
+                     primary_key=True)                                          # 订单时间, 按月分区
     ftime = sa.Column(INTEGER(unsigned=True), nullable=False)                   # 完成时间
     cid = sa.Column(INTEGER(unsigned=True), nullable=False, default=0)          # 订单发起时用户所看漫画
     chapter = sa.Column(INTEGER(unsigned=True), nullable=False, default=0)      # 订单发起时用户所需购买章节
@@ -191,7 +237,7 @@ class RechargeLog(TableBase):
     __table_args__ = (
         sa.Index('type_platform', 'platform'),
         sa.Index('order_uid', 'uid'),
-        MyISAMTableBase.__table_args__
+        InnoDBTableBase.__table_args__
     )
 
 
@@ -212,5 +258,5 @@ class DuplicateRecharge(TableBase):
     __table_args__ = (
         sa.Index('order_id', 'oid'),
         sa.Index('order_status', 'status'),
-        MyISAMTableBase.__table_args__
+        InnoDBTableBase.__table_args__
     )
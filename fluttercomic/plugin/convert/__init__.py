@@ -1,5 +1,8 @@
+# -*- coding:utf-8 -*-
 import os
+import time
 import subprocess
+from collections import namedtuple
 from simpleutil import systemutils
 from simpleutil.utils import zlibutils
 
@@ -8,24 +11,87 @@ from fluttercomic import common
 
 CONVERT = systemutils.find_executable('fluttercomic-resize')
 
+# 章节转换最长时间
+CHAPTERTIMEOUT = 3600
+
+# 转换进程--progress输出的进度行前缀
+PROGRESS = 'progress'
+
+# 转换进程退出码与cpu时间(包括进程内调用的convert子进程)
+JOB = namedtuple('job', ['code', 'utime', 'stime', 'elapsed'])
+
+
+def _report(line, progress):
+    parts = line.split()
+    if len(parts) != 3 or parts[0] != PROGRESS:
+        return
+    try:
+        progress(int(parts[1]), int(parts[2]))
+    except ValueError:
+        return
+
+
+def execute(args, progress=None):
+    """执行转换进程并等待退出, 会阻塞调用线程
+
+    eventlet中通过tpool.execute在原生线程中调用, progress回调也在原生线程中执行
+    回调中只能修改数据, 不能切换协程
+    """
+    start = time.time()
+    if progress:
+        args = args + ['--progress']
+    sub = subprocess.Popen(args, close_fds=True, executable=CONVERT,
+                           stdout=subprocess.PIPE if progress else None)
+    if progress:
+        for line in iter(sub.stdout.readline, ''):
+            _report(line, progress)
+        sub.stdout.close()
+    # wait4的rusage包含已经回收的子进程
+    pid, status, rusage = os.wait4(sub.pid, 0)
+    if os.WIFSIGNALED(status):
+        sub.returncode = -os.WTERMSIG(status)
+    else:
+        sub.returncode = os.WEXITSTATUS(status)
+    job = JOB(sub.returncode, rusage.ru_utime, rusage.ru_stime, time.time() - start)
+    if job.code:
+        raise ValueError('Convert process exit with code %d' % job.code)
+    return job
+
+
+def count_pages(path, ext):
+    """转换后章节页数, 非严格模式下转换会跳过不是图片的文件"""
+    suffix = '.%s' % ext
+    return len([name for name in os.listdir(path)
+                if name.endswith(suffix) and name[:-len(suffix)].isdigit()])
+
+
+def page_sizes(path, ext, count):
+    """转换后章节每页文件大小"""
+    return [os.path.getsize(os.path.join(path, '%d.%s' % (page, ext))) for page in xrange(1, count + 1)]
+
+
 def convert_cover(target, rename='main.webp', size='1600x1200', maxsize=250000, logfile=None):
+    """转换封面, 返回JOB"""
     args = [CONVERT, '--target', target, '-s', size, '-m', str(maxsize), '-r', rename, '-o', '15']
     if logfile:
         args.extend(['--log-file', logfile, '--loglevel', 'info'])
         with open(logfile, 'w') as f:
             f.write('%s\n' % ' '.join(args))
-    sub = subprocess.Popen(args, close_fds=True, executable=CONVERT)
-    systemutils.subwait(sub)
+    return execute(args)
 
 
-def convert_chapter(dst, key, strict=True, ext='webp', size='1200x900', maxsize=250000, logfile=None):
-    # call convert
-    args = [CONVERT, '--target', dst, '-e', ext, '-s', size, '-m', str(maxsize), '-k', key, '-o', '3600']
+def convert_chapter(dst, key, strict=True, ext='webp', size='1200x900', maxsize=250000,
+                    order=None, renditions=None, logfile=None, progress=None):
+    """转换章节, progress(done, total)接收转换进度, 返回JOB"""
+    args = [CONVERT, '--target', dst, '-e', ext, '-s', size, '-m', str(maxsize), '-k', key, '-o', str(CHAPTERTIMEOUT)]
+    if renditions:
+        args.extend(['--renditions', ','.join(renditions)])
+    if order:
+        args.extend(['--order', order])
     if not strict:
         args.append('--nostrict')
     if logfile:
         args.extend(['--log-file', logfile, '--loglevel', 'info'])
         with open(logfile, 'w') as f:
             f.write('%s\n' % ' '.join(args))
-    sub = subprocess.Popen(args, close_fds=True, executable=CONVERT)
-    systemutils.subwait(sub)
+    return execute(args, progress)
@@ -0,0 +1,80 @@
+# -*- coding:utf-8 -*-
+"""章节图片排序
+
+排序key在排序前为每个文件计算一次
+
+    natural     自然排序, p2_10.jpg < p10_2.jpg, 2.jpg < 10.jpg
+    page        优先按p/pg/page标记后的页码排序, 如 c012_p03.jpg, 无标记按natural
+    last        优先按文件名中最后一个数字排序, 如 Vol01-Ch003-012.jpg, img (10).jpg
+
+其他值作为正则表达式, 按匹配分组中的数字排序, 不匹配的文件按natural排在后面
+"""
+import re
+
+NUMREGEX = re.compile(r'(\d+)')
+PAGEREGEX = re.compile(r'(?:^|[^a-z])(?:page|pg|p)[\s_\-.]*(\d+)', re.IGNORECASE)
+
+NATURAL = 'natural'
+PAGE = 'page'
+LAST = 'last'
+
+RULES = (NATURAL, PAGE, LAST)
+
+
+def natural_key(name):
+    """p2_10.jpg -> ('p', 2, '_', 10, '.jpg', 'p2_10.jpg')"""
+    parts = NUMREGEX.split(name.lower())
+    # split结果偶数位为字符串, 奇数位为数字, 同位置比较类型一致
+    parts[1::2] = map(int, parts[1::2])
+    parts.append(name)
+    return tuple(parts)
+
+
+def _page_key(name):
+    match = PAGEREGEX.search(name)
+    if match:
+        return 0, int(match.group(1)), natural_key(name)
+    return 1, 0, natural_key(name)
+
+
+def _last_key(name):
+    keys = NUMREGEX.findall(name)
+    if keys:
+        return 0, int(keys[-1]), natural_key(name)
+    return 1, 0, natural_key(name)
+
+
+def _regex_key(pattern):
+    try:
+        regex = re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        raise ValueError('Order rule %s not a regex' % pattern)
+    if not regex.groups:
+        raise ValueError('Order regex %s has no group' % regex.pattern)
+
+    def _key(name):
+        match = regex.search(name)
+        if match:
+            try:
+                return 0, tuple(int(value) for value in match.groups()), natural_key(name)
+            except (TypeError, ValueError):
+                pass
+        return 1, (), natural_key(name)
+
+    return _key
+
+
+def sortkey(rule=NATURAL):
+    """get sort key function by rule name or regex"""
+    if not rule or rule == NATURAL:
+        return natural_key
+    if rule == PAGE:
+        return _page_key
+    if rule == LAST:
+        return _last_key
+    return _regex_key(rule)
+
+
+def sort_pages(names, rule=NATURAL):
+    """sort file names as page order"""
+    return sorted(names, key=sortkey(rule))
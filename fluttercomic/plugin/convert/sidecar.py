@@ -0,0 +1,67 @@
+# -*- coding:utf-8 -*-
+"""章节图片元数据文件, 转换完成后写入章节目录
+
+每个尺寸一个文件, pages.bin与pages_<size>.bin, 小端定长结构
+
+    头部    magic(4s) version(B) hashsize(B) count(H)
+    每页    width(H) height(H) bytes(I) hash(8s)
+
+hash为图片文件md5的前8字节
+"""
+import os
+import struct
+import hashlib
+from collections import namedtuple
+
+from fluttercomic.plugin.convert import sniff
+
+MAGIC = 'FCPM'
+VERSION = 1
+HASHSIZE = 8
+
+HEADER = struct.Struct('<4sBBH')
+PAGE = struct.Struct('<HHI%ds' % HASHSIZE)
+
+PAGEMETA = namedtuple('pagemeta', ['width', 'height', 'bytes', 'hash'])
+
+BUFSIZE = 65536
+
+
+def filename(size=None):
+    return 'pages_%s.bin' % size if size else 'pages.bin'
+
+
+def page(path):
+    """读取一个已转换图片的元数据"""
+    info = sniff.sniff(path)
+    if not info:
+        raise ValueError('%s not image file' % path)
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(BUFSIZE), ''):
+            md5.update(buf)
+    return PAGEMETA(info.width or 0, info.height or 0, info.size, md5.digest()[:HASHSIZE])
+
+
+def dumps(pages):
+    return HEADER.pack(MAGIC, VERSION, HASHSIZE, len(pages)) + \
+           ''.join(PAGE.pack(*meta) for meta in pages)
+
+
+def loads(buf):
+    magic, version, hashsize, count = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION or hashsize != HASHSIZE:
+        raise ValueError('Page metadata file format error')
+    if len(buf) != HEADER.size + PAGE.size * count:
+        raise ValueError('Page metadata file size error')
+    return [PAGEMETA(*PAGE.unpack_from(buf, HEADER.size + PAGE.size * index))
+            for index in xrange(count)]
+
+
+def write(path, pages):
+    """先写临时文件再改名, 读取方不会读到不完整文件"""
+    tmp = '%s.tmp' % path
+    with open(tmp, 'wb') as f:
+        f.write(dumps(pages))
+    os.chmod(tmp, 0o644)
+    os.rename(tmp, path)
@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+"""通过文件头识别图片类型与尺寸
+
+文件只打开一次, 除jpg需要跳过段读取SOF以外只读取文件头
+"""
+import os
+import struct
+from collections import namedtuple
+
+HEADSIZE = 32
+# jpg最多查找段数量
+MAXSEGMENTS = 64
+
+JPG = 'jpg'
+PNG = 'png'
+BMP = 'bmp'
+WEBP = 'webp'
+GIF = 'gif'
+
+IMGINFO = namedtuple('imginfo', ['type', 'width', 'height', 'size'])
+
+# jpg中带尺寸的SOF段, C4/C8/CC不是SOF
+SOFMARKERS = frozenset([0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7,
+                        0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf])
+
+
+def _png(head, f):
+    if head[12:16] != 'IHDR':
+        return None, None
+    return struct.unpack('>II', head[16:24])
+
+
+def _gif(head, f):
+    return struct.unpack('<HH', head[6:10])
+
+
+def _bmp(head, f):
+    dib = struct.unpack('<I', head[14:18])[0]
+    if dib == 12:
+        return struct.unpack('<HH', head[18:22])
+    width, height = struct.unpack('<ii', head[18:26])
+    return width, abs(height)
+
+
+def _webp(head, f):
+    chunk = head[12:16]
+    if chunk == 'VP8 ':
+        # 3字节frame tag + 3字节start code之后是14bit宽高
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == 'VP8L':
+        if head[20] != '\x2f':
+            return None, None
+        bits = struct.unpack('<I', head[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == 'VP8X':
+        width = struct.unpack('<I', head[24:27] + '\x00')[0]
+        height = struct.unpack('<I', head[27:30] + '\x00')[0]
+        return width + 1, height + 1
+    return None, None
+
+
+def _jpg(head, f):
+    f.seek(2)
+    for _ in xrange(MAXSEGMENTS):
+        marker = f.read(2)
+        if len(marker) != 2 or marker[0] != '\xff':
+            break
+        code = ord(marker[1])
+        # 填充字节
+        while code == 0xff:
+            code = ord(f.read(1) or '\x00')
+        # 无长度的标记
+        if code == 0x01 or 0xd0 <= code <= 0xd7:
+            continue
+        length = f.read(2)
+        if len(length) != 2:
+            break
+        length = struct.unpack('>H', length)[0]
+        if code in SOFMARKERS:
+            data = f.read(5)
+            if len(data) != 5:
+                break
+            height, width = struct.unpack('>xHH', data)
+            return width, height
+        if code == 0xda:    # 图片数据开始, 没有找到SOF
+            break
+        f.seek(length - 2, os.SEEK_CUR)
+    return None, None
+
+
+def _type(head):
+    if head[:3] == '\xff\xd8\xff':
+        return JPG, _jpg
+    if head[:8] == '\x89PNG\r\n\x1a\n':
+        return PNG, _png
+    if head[:4] == 'RIFF' and head[8:12] == 'WEBP':
+        return WEBP, _webp
+    if head[:6] in ('GIF87a', 'GIF89a'):
+        return GIF, _gif
+    if head[:2] == 'BM':
+        return BMP, _bmp
+    return None, None
+
+
+def sniff(path):
+    """图片类型, 宽, 高, 文件大小, 不是可识别图片返回None"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(HEADSIZE)
+        imgtype, reader = _type(head)
+        if not imgtype:
+            return None
+        if len(head) < HEADSIZE:
+            return IMGINFO(imgtype, None, None, size)
+        try:
+            width, height = reader(head, f)
+        except (struct.error, IOError):
+            width, height = None, None
+    return IMGINFO(imgtype, width, height, size)
+
+
+def fit(info, width, height):
+    """尺寸已知并且不超过目标尺寸"""
+    if not info or not info.width or not info.height:
+        return False
+    return info.width <= width and info.height <= height
@@ -2,13 +2,15 @@
 import time
 import abc
 import six
-from requests import sessions
-from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from eventlet import semaphore
+from sqlalchemy.sql import and_
 
 from simpleutil.config import cfg
 from simpleutil.log import log as logging
 from simpleutil.utils import singleton
 from simpleutil.utils import jsonutils
+from simpleutil.utils import importutils
 
 from simpleservice.wsgi.middleware import MiddlewareContorller
 from simpleservice.ormdb.exceptions import DBError
@@ -18,16 +20,37 @@ from simpleservice.ormdb.api import model_query
 from goperation.manager.utils import resultutils
 
 from fluttercomic import common
+from fluttercomic.api import endpoint_session
+from fluttercomic.api.wsgi.token import verify
+from fluttercomic.api.wsgi.token import M
 from fluttercomic.models import Order
+from fluttercomic.models import OrderSerial
 from fluttercomic.models import User
 from fluttercomic.models import RechargeLog
 from fluttercomic.models import DuplicateRecharge
+from fluttercomic.plugin.platforms import cache
+from fluttercomic.plugin.platforms import gateway
+from fluttercomic.plugin.platforms import reconciler
 
 CONF = cfg.CONF
 
 
 LOG = logging.getLogger(__name__)
 
+# 完成回调的订单结果缓存, 平台重复回调不再锁用户
+NOTIFYCACHE = 3600
+NOTIFYCACHESIZE = 20000
+RECORDED = cache.ResultCache(NOTIFYCACHE, NOTIFYCACHESIZE)
+
+# 平台启动耗时(毫秒), module为导入controller耗时, client为创建client耗时
+STARTUP = OrderedDict()
+
+
+def startup(name, key, start):
+    elapsed = int((time.time() - start)*1000)
+    STARTUP.setdefault(name, dict(module=None, client=None))[key] = elapsed
+    return elapsed
+
 
 @singleton.singleton
 class PlatformsRequestPublic(MiddlewareContorller):
@@ -40,11 +63,31 @@ class PlatformsRequestPublic(MiddlewareContorller):
         return resultutils.results(result='get platforms success',
                                    data=self.__conf.platforms)
 
+    @verify(vtype=M)
+    def gateways(self, req, body=None):
+        """支付网关延迟与熔断状态, 管理员接口"""
+        return resultutils.results(result='get platform gateways success',
+                                   data=gateway.metrics())
+
+    @verify(vtype=M)
+    def reconciler(self, req, body=None):
+        """订单对账积压与延迟, 管理员接口"""
+        return resultutils.results(result='get order reconciler success',
+                                   data=RECONCILER.report())
+
+    @verify(vtype=M)
+    def startup(self, req, body=None):
+        """平台启动耗时, 管理员接口"""
+        return resultutils.results(result='get platforms startup success',
+                                   data=[dict(platform=name, **STARTUP[name]) for name in STARTUP])
+
 
 class PlatformsRequestBase(MiddlewareContorller):
 
     ADMINAPI = False
     JSON = False
+    # 支付平台client, 有client的平台参与对账
+    CLIENT = None
 
     @staticmethod
     def extrouters(router, mapper, controller):
@@ -66,6 +109,21 @@ class PlatformsRequestBase(MiddlewareContorller):
     def notify(self, req, oid, body=None):
         raise NotImplementedError
 
+    @staticmethod
+    def idempotent(oid, func):
+        """同一订单的回调/确认同时只执行一次, 成功结果缓存, 重复回调直接返回缓存结果"""
+        return RECORDED.get(oid, func)
+
+    @staticmethod
+    def recorded(order):
+        """订单已经有充值记录"""
+        return order.state in (common.ORDER_PAID, common.ORDER_DUPLICATE)
+
+    @staticmethod
+    def recharged(order):
+        """缓存的回调结果"""
+        return dict(oid=order.oid, uid=order.uid, coins=order.gift+order.coin, money=order.money)
+
     @staticmethod
     def order(session, client, serial,
               uid, oid, money, cid, chapter,
@@ -83,12 +141,16 @@ class PlatformsRequestBase(MiddlewareContorller):
                           time=order_time or int(time.time()),
                           cid=cid,
                           chapter=chapter,
+                          state=common.ORDER_CREATED,
                           coins=user.coins,
                           gifts=user.gifts,
                           coin=coin,
                           gift=gift,
                           ext=jsonutils.dumps(ext) if ext else None)
             session.add(order)
+            if serial:
+                # 重复的流水号在这里触发DBDuplicateEntry
+                session.add(OrderSerial(serial=serial, oid=oid))
         return coin + gift
 
     @staticmethod
@@ -124,8 +186,15 @@ class PlatformsRequestBase(MiddlewareContorller):
                 user.coins += order.coin
                 user.gifts += order.gift
                 session.add(recharge)
+                session.flush()
+                session.query(Order).filter(and_(Order.oid == order.oid, Order.time == order.time)).update(
+                    {'state': common.ORDER_PAID}, synchronize_session=False)
         except DBDuplicateEntry:
             LOG.warning('Duplicate esure notify')
+            # 已支付的订单重复回调不修改状态, 只有未标记为已支付的订单才是异常的重复充值
+            session.query(Order).filter(and_(Order.oid == order.oid, Order.time == order.time,
+                                             Order.state == common.ORDER_CREATED)).update(
+                {'state': common.ORDER_DUPLICATE}, synchronize_session=False)
             d = DuplicateRecharge(oid=order.oid, uid=order.uid,
                                   coin=order.coin, gift=order.gift,
                                   money=order.money, currency=order.currency,
@@ -137,14 +206,52 @@ class PlatformsRequestBase(MiddlewareContorller):
                 LOG.error('Recodr duplicate recharge order fail')
 
 
+def _reconcile_record(session, order, serial, extdata):
+    """对账与平台回调使用同一个结果缓存, 回调已经完成的订单不重复记录"""
+    def _record():
+        PlatformsRequestBase.record(session, order, serial, extdata)
+        return PlatformsRequestBase.recharged(order)
+    return PlatformsRequestBase.idempotent(order.oid, _record)
+
+
+RECONCILER = reconciler.Reconciler(endpoint_session, _reconcile_record)
+
+
+class LazyClient(object):
+    """第一次使用时才导入client模块并创建client
+
+    client模块依赖cryptography等较重的库, 创建时还要加载密钥
+    """
+
+    def __init__(self, name, path, group):
+        self.name = name
+        self.path = path
+        self.group = group
+        self._client = None
+        # api服务没有monkey patch thread, 使用协程锁
+        self._lock = semaphore.Semaphore()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    start = time.time()
+                    client = importutils.import_class(self.path)(CONF[self.group])
+                    LOG.info('Platform %s client created in %dms' % (self.name,
+                                                                     startup(self.name, 'client', start)))
+                    self._client = client
+        return self._client
+
+    def __getattr__(self, attr):
+        return getattr(self.client, attr)
+
+
 # @six.add_metaclass(abc.ABCMeta)
 class PlatFormClient(object):
 
     def __init__(self, name, conf):
-        session = sessions.Session()
-        session.mount('http', HTTPAdapter(pool_maxsize=25))
-        session.mount('https', HTTPAdapter(pool_maxsize=25))
-        self.session = session
+        self.gateway = gateway.Gateway(name, conf)
         self.platform = name
         self.conf = conf
         self.roe = conf.roe
@@ -165,3 +272,7 @@ class PlatFormClient(object):
         if money not in self.choices:
             LOG.warning('money number not in chioces')
         return (0, money*self.scale) if self.sandbox else (money*self.scale, 0)
+
+    def query(self, order):
+        """主动向平台查询订单, 已支付返回(serial, extdata), 未支付返回None"""
+        raise NotImplementedError
@@ -0,0 +1,68 @@
+# -*- coding:utf-8 -*-
+"""支付平台结果缓存
+
+过期后第一个请求负责执行, 同一个key的其他请求等待执行结果, 不重复执行
+执行失败不缓存
+api服务没有monkey patch thread, 锁使用eventlet的semaphore, 只能在协程中使用
+"""
+import time
+from collections import OrderedDict
+
+from eventlet import semaphore
+
+
+class ResultCache(object):
+    """size为0时不限制数量"""
+
+    def __init__(self, ttl, size=0):
+        self.ttl = ttl
+        self.size = size
+        self.values = OrderedDict()
+        self.locks = {}
+        self.lock = semaphore.Semaphore()
+
+    def _cached(self, key):
+        cached = self.values.get(key)
+        if cached and cached[0] > time.time():
+            return cached
+        return None
+
+    def set(self, key, value):
+        with self.lock:
+            self.values.pop(key, None)
+            self.values[key] = (time.time() + self.ttl, value)
+            while self.size and len(self.values) > self.size:
+                self.values.popitem(last=False)
+
+    def get(self, key, loader):
+        """获取结果, 不存在或过期时调用loader"""
+        cached = self._cached(key)
+        if cached:
+            return cached[1]
+        with self.lock:
+            lock = self.locks.get(key)
+            if lock is None:
+                lock = self.locks[key] = [semaphore.Semaphore(), 0]
+            lock[1] += 1
+        try:
+            with lock[0]:
+                # 等待期间其他请求已经执行
+                cached = self._cached(key)
+                if cached:
+                    return cached[1]
+                value = loader()
+                self.set(key, value)
+                return value
+        finally:
+            with self.lock:
+                lock[1] -= 1
+                if not lock[1]:
+                    self.locks.pop(key, None)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+
+
+class CredentialCache(ResultCache):
+    """支付平台凭证缓存"""
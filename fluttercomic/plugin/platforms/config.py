@@ -10,6 +10,19 @@ platforms_opts = [
                 item_type=types.String(),
                 default=[],
                 help='Platforms list enabled'),
+    cfg.IntOpt('reconcile_interval',
+               min=0, max=3600,
+               default=0,
+               help='Seconds between pending order reconcile rounds, 0 means disable, '
+                    'enable on one endpoint only'),
+    cfg.IntOpt('reconcile_concurrency',
+               min=1, max=100,
+               default=10,
+               help='Max concurrent platform queries of order reconcile'),
+    cfg.IntOpt('reconcile_batch',
+               min=1, max=5000,
+               default=200,
+               help='Max orders to query each platform in one reconcile round'),
 ]
 
 platform_opts = [
@@ -28,7 +41,47 @@ platform_opts = [
     cfg.ListOpt('choices',
                 default=[],
                 item_type=types.Integer(),
-                help='Pay money choice')
+                help='Pay money choice'),
+    cfg.IntOpt('reconcile_delay',
+               min=0, max=3600,
+               default=120,
+               help='Seconds to wait platform notify before reconcile a pending order'),
+    cfg.IntOpt('reconcile_window',
+               min=60, max=30*86400,
+               default=7200,
+               help='Reconcile pending orders created in last seconds'),
+    cfg.IntOpt('concurrency',
+               min=1, max=500,
+               default=25,
+               help='Max concurrent requests to platform api'),
+    cfg.FloatOpt('queue_timeout',
+                 min=0, max=30,
+                 default=1.0,
+                 help='Seconds to wait for a free platform request slot'),
+    cfg.FloatOpt('connect_timeout',
+                 min=0.1, max=30,
+                 default=3.0,
+                 help='Platform api connect timeout seconds'),
+    cfg.FloatOpt('timeout',
+                 min=0.1, max=60,
+                 default=10.0,
+                 help='Platform api read timeout seconds'),
+    cfg.IntOpt('retries',
+               min=0, max=5,
+               default=2,
+               help='Retry times of idempotent platform api request'),
+    cfg.FloatOpt('backoff',
+                 min=0, max=10,
+                 default=0.2,
+                 help='Retry backoff base seconds, sleep random(0, backoff * 2^n)'),
+    cfg.IntOpt('breaker_threshold',
+               min=0, max=100,
+               default=5,
+               help='Platform api fail fast after continuous failures, 0 means never'),
+    cfg.IntOpt('breaker_reset',
+               min=1, max=600,
+               default=30,
+               help='Seconds before a probe request after platform api circuit open'),
 ]
 
 
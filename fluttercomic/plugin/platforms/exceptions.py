@@ -11,4 +11,10 @@ class CreateOrderError(OrderError):
     """ flutter comic create order error"""
 
 class EsureOrderError(OrderError):
-    """ flutter comic esure order error"""
\ No newline at end of file
+    """ flutter comic esure order error"""
+
+class GatewayError(OrderError):
+    """ flutter comic platform gateway request error"""
+
+class GatewayUnavailable(GatewayError):
+    """ platform gateway busy or circuit open"""
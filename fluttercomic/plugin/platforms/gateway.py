@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+"""支付平台网关请求
+
+每个平台一个Gateway, 限制同时进行的平台请求数量, 等待超时直接失败
+幂等请求在连接失败/超时/5xx时按指数退避加随机抖动重试
+平台连续失败达到阈值后熔断, 熔断期间直接失败, 到期后放行一个探测请求
+"""
+import time
+import random
+
+import eventlet
+from eventlet import semaphore
+import requests
+from requests import sessions
+from requests.adapters import HTTPAdapter
+
+from simpleutil.log import log as logging
+
+from fluttercomic.plugin.platforms import exceptions
+
+LOG = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALFOPEN = 'half-open'
+
+# 延迟统计分段(秒)
+BUCKETS = (0.1, 0.3, 1.0, 3.0, 10.0)
+
+GATEWAYS = {}
+
+
+class CircuitBreaker(object):
+    """threshold为0时不熔断"""
+
+    def __init__(self, name, threshold, reset):
+        self.name = name
+        self.threshold = threshold
+        self.reset = reset
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.probing = False
+
+    def allow(self):
+        if self.threshold <= 0 or self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.time() - self.opened >= self.reset:
+            self.state = HALFOPEN
+            self.probing = False
+        if self.state == HALFOPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def cancel(self):
+        """放行后请求没有发出"""
+        self.probing = False
+
+    def success(self):
+        self.failures = 0
+        self.probing = False
+        self.state = CLOSED
+
+    def failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.threshold <= 0:
+            return
+        if self.state == HALFOPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                LOG.error('%s gateway circuit open after %d failures' % (self.name, self.failures))
+            self.state = OPEN
+            self.opened = time.time()
+
+
+class Latency(object):
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, elapsed, error=False):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        for index, bucket in enumerate(BUCKETS):
+            if elapsed <= bucket:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def dumps(self):
+        return dict(count=self.count, errors=self.errors,
+                    retries=self.retries, rejected=self.rejected,
+                    avg=round(self.total / self.count, 4) if self.count else 0,
+                    max=round(self.max, 4),
+                    buckets=dict(zip(['%.1f' % b for b in BUCKETS] + ['inf'], self.buckets)))
+
+
+class Gateway(object):
+
+    def __init__(self, name, conf):
+        session = sessions.Session()
+        session.mount('http://', HTTPAdapter(pool_maxsize=conf.concurrency))
+        session.mount('https://', HTTPAdapter(pool_maxsize=conf.concurrency))
+        self.session = session
+        self.name = name
+        self.timeout = (conf.connect_timeout, conf.timeout)
+        self.queue_timeout = conf.queue_timeout
+        self.retries = conf.retries
+        self.backoff = conf.backoff
+        self.semaphore = semaphore.Semaphore(conf.concurrency)
+        self.breaker = CircuitBreaker(name, conf.breaker_threshold, conf.breaker_reset)
+        self.latency = Latency()
+        GATEWAYS[name] = self
+
+    def _request(self, method, url, **kwargs):
+        if not self.breaker.allow():
+            self.latency.rejected += 1
+            raise exceptions.GatewayUnavailable('%s gateway circuit open' % self.name)
+        if not self.semaphore.acquire(timeout=self.queue_timeout):
+            self.breaker.cancel()
+            self.latency.rejected += 1
+            raise exceptions.GatewayUnavailable('%s gateway busy' % self.name)
+        start = time.time()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except (Exception, eventlet.Timeout):
+            # 任何异常都要结束本次放行, 否则半开的探测请求一直不结束, 熔断无法恢复
+            self.latency.record(time.time() - start, error=True)
+            self.breaker.failure()
+            raise
+        finally:
+            self.semaphore.release()
+        failed = resp.status_code >= 500
+        self.latency.record(time.time() - start, error=failed)
+        if failed:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        return resp
+
+    def request(self, method, url, idempotent=False, **kwargs):
+        """非幂等请求只在连接超时(请求未发出)时重试"""
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            try:
+                resp = self._request(method, url, **kwargs)
+            except requests.RequestException as e:
+                error = e.__class__.__name__
+                retry = idempotent or isinstance(e, requests.ConnectTimeout)
+            else:
+                if resp.status_code < 500:
+                    return resp
+                error = 'HTTP %d' % resp.status_code
+                retry = idempotent
+            if not retry or attempt >= self.retries:
+                LOG.error('%s gateway %s %s fail: %s' % (self.name, method, url, error))
+                raise exceptions.GatewayError('%s gateway request fail: %s' % (self.name, error))
+            attempt += 1
+            self.latency.retries += 1
+            LOG.warning('%s gateway %s %s fail: %s, retry %d' % (self.name, method, url, error, attempt))
+            # full jitter
+            eventlet.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, url, idempotent=True, **kwargs):
+        return self.request('GET', url, idempotent=idempotent, **kwargs)
+
+    def post(self, url, idempotent=False, **kwargs):
+        return self.request('POST', url, idempotent=idempotent, **kwargs)
+
+    def metrics(self):
+        return dict(platform=self.name, state=self.breaker.state,
+                    free=self.semaphore.balance, latency=self.latency.dumps())
+
+
+def metrics():
+    return [GATEWAYS[name].metrics() for name in sorted(GATEWAYS)]
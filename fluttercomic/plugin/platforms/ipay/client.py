@@ -3,6 +3,7 @@ from urllib import unquote
 from urllib import urlencode
 
 import base64
+from eventlet import tpool
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives import hashes
@@ -14,7 +15,7 @@ from simpleutil.utils import jsonutils
 
 from fluttercomic.plugin.platforms import exceptions
 from fluttercomic.plugin.platforms.base import PlatFormClient
-from fluttercomic.plugin.platforms.paypal.config import NAME
+from fluttercomic.plugin.platforms.ipay.config import NAME
 
 LOG = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ class IPayApi(PlatFormClient):
     CURRENCYS = {'CNY': 'RMB'}
 
     ORDERURL = 'https://cp.iapppay.com/payapi/order'
+    QUERYURL = 'https://cp.iapppay.com/payapi/queryresult'
     RESULTSURL = 'https://cp.iapppay.com/payapi'
     GWURL = 'https://web.iapppay.com/h5/gateway'
 
@@ -56,11 +58,17 @@ class IPayApi(PlatFormClient):
     def _currency(self):
         return IPayApi.CURRENCYS.get(self.currency, self.currency)
 
+    def _rsa_sign(self, data):
+        return base64.b64encode(self.private_key.sign(data, IPayApi.RSAPRIVATEPADING, IPayApi.HASHES()))
+
+    def _rsa_verify(self, data, sign):
+        self.public_key.verify(base64.b64decode(sign), data, IPayApi.RSAPUBLICPADING, IPayApi.HASHES())
+
     def mksign(self, data, t):
         if t == 'RSA':
             try:
-                sign = self.private_key.sign(data, IPayApi.RSAPRIVATEPADING, IPayApi.HASHES())
-                return base64.b64encode(sign)
+                # RSA运算在原生线程中执行, 不阻塞hub
+                return tpool.execute(self._rsa_sign, data)
             except Exception as e:
                 LOG.exception('Rsa sign error: %s' % e.__class__.__name__)
                 raise exceptions.SignOrderError('RSA sign fail')
@@ -70,8 +78,7 @@ class IPayApi(PlatFormClient):
     def verify(self, data, sign, t):
         if t == 'RSA':
             try:
-                self.public_key.verify(base64.b64decode(sign), data,
-                                       IPayApi.RSAPUBLICPADING, IPayApi.HASHES())
+                tpool.execute(self._rsa_verify, data, sign)
             except InvalidSignature:
                 LOG.error('Rsa verify fail, invalid sign')
                 return False
@@ -107,22 +114,17 @@ class IPayApi(PlatFormClient):
 
     @staticmethod
     def decode(text, key):
-        data = unquote(text.encode('utf-8')).split('&')
-        ok = False if key else True
-        results = OrderedDict()
-        for r in data:
-            for i, s in enumerate(r):
-                if s == '=':
-                    k = r[0:i]
-                    v = r[i+1:]
-                    break
-            else:
+        """解析url编码的返回, 先按&和=切分再解码各个值"""
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        results = {}
+        for pair in text.split('&'):
+            k, sep, v = pair.partition('=')
+            if not sep:
                 raise exceptions.OrderError('Can not decode url data')
-            if k == key:
-                ok = True
-            results[k] = v
-        if not ok:
-            exceptions.OrderError('url decode key not found')
+            results[unquote(k)] = unquote(v)
+        if key and key not in results:
+            raise exceptions.OrderError('url decode key not found')
         return results
 
     def payment(self, money, oid, req):
@@ -146,7 +148,7 @@ class IPayApi(PlatFormClient):
         params['sign'] = sign
         params['signtype'] = self.signtype
 
-        resp = self.session.post(self.ORDERURL, data=urlencode(params), timeout=10)
+        resp = self.gateway.post(self.ORDERURL, data=urlencode(params))
         LOG.debug('response text %s' % str(resp.text))
         results = IPayApi.decode(resp.text, self.TRANSDATA)
         transdata = jsonutils.loads_as_bytes(results.get(self.TRANSDATA))
@@ -162,3 +164,28 @@ class IPayApi(PlatFormClient):
             raise exceptions.VerifyOrderError('RSA verify payment result sign error')
 
         return str(transid), self.ipay_url(transid), self.url_r or '', self.url_h or ''
+
+    def query(self, order):
+        """主动查询订单, 未支付返回None"""
+        data = OrderedDict()
+        data['appid'] = self.appid
+        data['cporderid'] = str(order.oid)
+
+        transdata = jsonutils.dumps_as_bytes(data)
+        params = OrderedDict(transdata=transdata)
+        params['sign'] = self.mksign(transdata, self.signtype)
+        params['signtype'] = self.signtype
+
+        resp = self.gateway.post(self.QUERYURL, data=urlencode(params), idempotent=True)
+        results = IPayApi.decode(resp.text, self.TRANSDATA)
+        transdata = jsonutils.loads_as_bytes(results.get(self.TRANSDATA))
+        if transdata.get('code'):
+            # 订单不存在或未支付
+            LOG.debug('ipay query order %d code %s' % (order.oid, str(transdata.get('code'))))
+            return None
+        if not self.verify(results.get(self.TRANSDATA), results.get('sign'), results.get('signtype')):
+            raise exceptions.VerifyOrderError('RSA verify query result sign error')
+        # result 0 支付成功
+        if transdata.get('result') != 0:
+            return None
+        return str(transdata.get('transid')), None
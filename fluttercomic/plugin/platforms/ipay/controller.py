@@ -26,7 +26,7 @@ from goperation.manager.utils import resultutils
 
 from fluttercomic.api.wsgi.token import verify
 from fluttercomic.plugin.platforms.base import PlatformsRequestBase
-from fluttercomic.plugin.platforms.ipay.client import IPayApi
+from fluttercomic.plugin.platforms.base import LazyClient
 
 from fluttercomic.models import Order
 from fluttercomic.models import User
@@ -43,7 +43,7 @@ LOG = logging.getLogger(__name__)
 
 CONF.register_group(config.group)
 config.register_opts(config.group)
-iPayApi = IPayApi(CONF[config.group.name])
+iPayApi = LazyClient(config.NAME, 'fluttercomic.plugin.platforms.ipay.client.IPayApi', config.group.name)
 
 FAULT_MAP = {InvalidArgument: webob.exc.HTTPClientError,
              NoResultFound: webob.exc.HTTPNotFound,
@@ -52,6 +52,8 @@ FAULT_MAP = {InvalidArgument: webob.exc.HTTPClientError,
              exceptions.VerifyOrderError: webob.exc.HTTPInternalServerError,
              exceptions.SignOrderError: webob.exc.HTTPInternalServerError,
              exceptions.EsureOrderError: webob.exc.HTTPInternalServerError,
+             exceptions.GatewayError: webob.exc.HTTPBadGateway,
+             exceptions.GatewayUnavailable: webob.exc.HTTPServiceUnavailable,
              }
 
 
@@ -95,6 +97,7 @@ ESUREPAY = {
 @singleton.singleton
 class IpayRequest(PlatformsRequestBase):
 
+    CLIENT = iPayApi
 
     def new(self, req, body=None):
         """发起订单"""
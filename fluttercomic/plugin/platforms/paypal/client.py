@@ -1,7 +1,5 @@
 import copy
-from requests import sessions
 from requests.auth import HTTPBasicAuth
-from requests.adapters import HTTPAdapter
 
 from simpleutil.log import log as logging
 from simpleutil.utils import jsonutils
@@ -86,9 +84,8 @@ class PayPalApi(PlatFormClient):
             redirect_urls={"return_url": "http://www.163.com",
                            "cancel_url": cancel}
         )
-        resp = self.session.post(url, auth=self.auth, json=data,
-                                 headers={"Content-Type": "application/json"},
-                                 timeout=10)
+        resp = self.gateway.post(url, auth=self.auth, json=data,
+                                 headers={"Content-Type": "application/json"})
         payment =  jsonutils.loads_as_bytes(resp.text)
         if payment.get('state') != 'created':
             raise exceptions.CreateOrderError('Create Paypal payment error')
@@ -99,12 +96,30 @@ class PayPalApi(PlatFormClient):
         url = self.api + '/v1/payments/payment' + '/%s/execute' % paypal.get('paymentID')
         data = dict(payer_id=paypal.get('payerID'),
                     transactions=[dict(amount=dict(total=money, currency=self.currency))])
-        resp = self.session.post(url, auth=self.auth, json=data,
-                                 headers={"Content-Type": "application/json"}, timeout=10)
+        # PayPal-Request-Id相同的请求paypal只执行一次, 可以重试
+        resp = self.gateway.post(url, auth=self.auth, json=data, idempotent=True,
+                                 headers={"Content-Type": "application/json",
+                                          "PayPal-Request-Id": 'execute-%s' % paypal.get('paymentID')})
         if LOG.isEnabledFor(logging.DEBUG):
             LOG.debug(resp.text)
         return jsonutils.loads_as_bytes(resp.text)
 
+    def query(self, order):
+        """查询payment, 用户已经确认但没有执行的payment在这里执行, 未支付返回None"""
+        url = self.api + '/v1/payments/payment/%s' % order.serial
+        resp = self.gateway.get(url, auth=self.auth,
+                                headers={"Content-Type": "application/json"})
+        payment = jsonutils.loads_as_bytes(resp.text)
+        state = payment.get('state')
+        if state == 'approved':
+            return order.serial, None
+        payer_id = (payment.get('payer') or {}).get('payer_info', {}).get('payer_id')
+        if state != 'created' or not payer_id:
+            LOG.debug('Paypal payment %s state %s' % (order.serial, state))
+            return None
+        self.execute(dict(paymentID=order.serial, payerID=payer_id), order.money)
+        return order.serial, None
+
     def execute(self, paypal, money):
         pay_result = self._execute(paypal, money)
         state = pay_result.get('state')
@@ -26,7 +26,7 @@ from goperation.manager.utils import resultutils
 
 from fluttercomic.api.wsgi.token import verify
 from fluttercomic.plugin.platforms.base import PlatformsRequestBase
-from fluttercomic.plugin.platforms.paypal.client import PayPalApi
+from fluttercomic.plugin.platforms.base import LazyClient
 
 from fluttercomic.models import Order
 from fluttercomic.models import User
@@ -43,12 +43,14 @@ LOG = logging.getLogger(__name__)
 
 CONF.register_group(config.group)
 config.register_opts(config.group)
-paypalApi = PayPalApi(CONF[config.group.name])
+paypalApi = LazyClient(config.NAME, 'fluttercomic.plugin.platforms.paypal.client.PayPalApi', config.group.name)
 
 FAULT_MAP = {InvalidArgument: webob.exc.HTTPClientError,
              NoResultFound: webob.exc.HTTPNotFound,
              MultipleResultsFound: webob.exc.HTTPInternalServerError,
-             exceptions.EsureOrderError: webob.exc.HTTPInternalServerError
+             exceptions.EsureOrderError: webob.exc.HTTPInternalServerError,
+             exceptions.GatewayError: webob.exc.HTTPBadGateway,
+             exceptions.GatewayUnavailable: webob.exc.HTTPServiceUnavailable,
              }
 
 
@@ -92,6 +94,8 @@ ESUREPAY = {
 @singleton.singleton
 class PaypalRequest(PlatformsRequestBase):
 
+    CLIENT = paypalApi
+
     def html(self, req, body=None):
         """生成订单页面html"""
         try:
@@ -156,32 +160,42 @@ class PaypalRequest(PlatformsRequestBase):
         paypal = body.get('paypal')
         uid = body.get('uid')
 
-        session = endpoint_session()
-        query = model_query(session, Order, filter=Order.oid == oid)
-        order = query.one()
-        if order.uid != uid:
+        def _notify():
+            session = endpoint_session()
+            query = model_query(session, Order, filter=Order.oid == oid)
+            order = query.one()
+            if order.uid != uid:
+                raise InvalidArgument('User id not the same')
+            if order.serial != paypal.get('paymentID'):
+                raise InvalidArgument('paymentID not the same')
+            if self.recorded(order):
+                return self.recharged(order)
+
+            def paypal_execute(extdata=None):
+                LOG.info('Call paypalApi execute order')
+                paypalApi.execute(paypal, order.money)
+                return extdata
+
+            try:
+                self.record(session, order, None, None,
+                            on_transaction_call=paypal_execute)
+            except DBError:
+                # 写库失败不能缓存为成功结果, 抛出后平台重复回调会再次记录
+                LOG.error('Paypal save order %d to database fail' % order.oid)
+                raise
+            except exceptions.EsureOrderError:
+                LOG.error('Call Paypal execute order fail')
+                raise
+            return self.recharged(order)
+
+        result = self.idempotent(oid, _notify)
+        if result['uid'] != uid:
             raise InvalidArgument('User id not the same')
-        if order.serial != paypal.get('paymentID'):
-            raise InvalidArgument('paymentID not the same')
-
-        def paypal_execute(extdata=None):
-            LOG.info('Call paypalApi execute order')
-            paypalApi.execute(paypal, order.money)
-            return extdata
-
-        try:
-            self.record(session, order, None, None,
-                        on_transaction_call=paypal_execute)
-        except DBError:
-            LOG.error('Paypal save order %d to database fail' % order.oid)
-        except exceptions.EsureOrderError:
-            LOG.error('Call Paypal execute order fail')
-            raise
 
         return resultutils.results(result='notify orde success',
                                    data=[dict(paypal=dict(paymentID=paypal.get('paymentID'),
                                                           payerID=paypal.get('payerID')),
-                                              oid=oid, coins=order.gift+order.coin, money=order.money)
+                                              oid=oid, coins=result['coins'], money=result['money'])
                                          ])
 
     def esure(self, req, oid, body=None):
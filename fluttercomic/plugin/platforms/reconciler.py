@@ -0,0 +1,131 @@
+# -*- coding:utf-8 -*-
+"""未确认订单对账
+
+支付平台回调丢失时订单一直没有充值记录, 定时扫描平台有效期内未支付的订单,
+主动向平台查询, 已经支付的订单补充值记录
+多个endpoint只需要一个开启对账(reconcile_interval)
+"""
+import time
+from collections import OrderedDict
+
+import eventlet
+from eventlet import greenpool
+from sqlalchemy import func
+from sqlalchemy.sql import and_
+
+from simpleutil.log import log as logging
+
+from fluttercomic import common
+from fluttercomic.models import Order
+from fluttercomic.plugin.platforms import exceptions
+
+LOG = logging.getLogger(__name__)
+
+
+class Reconciler(object):
+
+    def __init__(self, session, record):
+        self.session = session
+        self.record = record
+        self.clients = OrderedDict()
+        self.cursors = {}
+        self.stats = {}
+        self.interval = 0
+        self.batch = 0
+        self.pool = None
+        self.started = False
+
+    def register(self, client):
+        if client.name in self.clients:
+            return
+        self.clients[client.name] = client
+        self.cursors[client.name] = 0
+        self.stats[client.name] = dict(backlog=0, lag=0, paid=0, unpaid=0, failed=0, expired=0,
+                                       last=0, elapsed=0)
+
+    def start(self, conf):
+        if self.started or not conf.reconcile_interval or not self.clients:
+            return
+        self.started = True
+        self.interval = conf.reconcile_interval
+        self.batch = conf.reconcile_batch
+        self.pool = greenpool.GreenPool(conf.reconcile_concurrency)
+        LOG.info('Order reconciler start for %s' % ','.join(self.clients.keys()))
+        eventlet.spawn_n(self._loop)
+
+    def _loop(self):
+        while True:
+            eventlet.sleep(self.interval)
+            try:
+                self.reconcile()
+            except Exception:
+                LOG.exception('Reconcile pending orders fail')
+
+    def pending(self, session, client, now):
+        """平台有效期内未支付的订单, 刚创建的订单等待平台回调, 走(state, time)索引"""
+        return session.query(Order).filter(and_(Order.state == common.ORDER_CREATED,
+                                                Order.time >= now - client.conf.reconcile_window,
+                                                Order.time <= now - client.conf.reconcile_delay,
+                                                Order.platform == client.name,
+                                                Order.sandbox == client.sandbox))
+
+    def expire(self, session, client, now):
+        """超出对账窗口仍未支付的订单标记为过期"""
+        query = session.query(Order).filter(and_(Order.state == common.ORDER_CREATED,
+                                                 Order.time < now - client.conf.reconcile_window,
+                                                 Order.platform == client.name))
+        return query.update({'state': common.ORDER_EXPIRED}, synchronize_session=False)
+
+    def reconcile(self):
+        for client in self.clients.values():
+            self._platform(client)
+
+    def _platform(self, client):
+        now = int(time.time())
+        stats = self.stats[client.name]
+        session = self.session()
+        expired = self.expire(session, client, now)
+        if expired:
+            LOG.info('Reconcile %s expired %d orders' % (client.name, expired))
+            stats['expired'] += expired
+        query = self.pending(session, client, now)
+        backlog, oldest = query.with_entities(func.count(Order.oid), func.min(Order.time)).one()
+        stats.update(backlog=backlog, lag=now - oldest if oldest else 0, last=now)
+        if not backlog:
+            self.cursors[client.name] = 0
+            return
+        # 每轮从上次位置继续, 避免一直查询前面未支付的订单
+        orders = query.filter(Order.oid > self.cursors[client.name]).order_by(Order.oid).limit(self.batch).all()
+        self.cursors[client.name] = orders[-1].oid if len(orders) >= self.batch else 0
+        for order in orders:
+            self.pool.spawn_n(self._order, client, order, stats)
+        self.pool.waitall()
+        stats['elapsed'] = round(time.time() - now, 3)
+        LOG.info('Reconcile %s orders, backlog %d, lag %ds' % (client.name, backlog, stats['lag']))
+
+    def _order(self, client, order, stats):
+        try:
+            result = client.query(order)
+        except exceptions.GatewayUnavailable as e:
+            LOG.warning('Reconcile order %d skip, %s' % (order.oid, e.message))
+            stats['failed'] += 1
+            return
+        except Exception as e:
+            LOG.error('Reconcile order %d query fail, %s' % (order.oid, e.__class__.__name__))
+            stats['failed'] += 1
+            return
+        if result is None:
+            stats['unpaid'] += 1
+            return
+        serial, extdata = result
+        try:
+            self.record(self.session(), order, serial, extdata)
+        except Exception:
+            LOG.exception('Reconcile order %d record fail' % order.oid)
+            stats['failed'] += 1
+            return
+        LOG.info('Reconcile %s order %d paid' % (client.name, order.oid))
+        stats['paid'] += 1
+
+    def report(self):
+        return [dict(platform=name, **self.stats[name]) for name in self.clients]
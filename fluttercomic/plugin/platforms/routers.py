@@ -1,15 +1,27 @@
+import time
+import webob.exc
+
 from simpleutil.config import cfg
+from simpleutil.log import log as logging
 from simpleutil.utils import importutils
 
 from simpleservice.wsgi import router
 from simpleservice.wsgi.middleware import controller_return_response
 
+from goperation.manager.exceptions import TokenError
+
 from fluttercomic import common
 
 from fluttercomic.plugin.platforms.base import PlatformsRequestPublic
+from fluttercomic.plugin.platforms.base import RECONCILER
+from fluttercomic.plugin.platforms.base import startup
 
 CONF = cfg.CONF
 
+LOG = logging.getLogger(__name__)
+
+FAULT_MAP = {TokenError: webob.exc.HTTPUnauthorized}
+
 
 class Routers(router.RoutersBase):
 
@@ -19,19 +31,33 @@ class Routers(router.RoutersBase):
 
         conf = CONF[common.NAME]
 
-        controller = controller_return_response(PlatformsRequestPublic(), {})
+        controller = controller_return_response(PlatformsRequestPublic(), FAULT_MAP)
 
         self._add_resource(mapper, controller,
                            path='/%s/platforms' % common.NAME,
                            get_action='platforms')
 
+        self._add_resource(mapper, controller,
+                           path='/%s/platforms/gateways' % common.NAME,
+                           get_action='gateways')
+
+        self._add_resource(mapper, controller,
+                           path='/%s/platforms/reconciler' % common.NAME,
+                           get_action='reconciler')
+
+        self._add_resource(mapper, controller,
+                           path='/%s/platforms/startup' % common.NAME,
+                           get_action='startup')
 
         for platform in conf.platforms:
+            start = time.time()
             mod = 'fluttercomic.plugin.platforms.%s.controller' % platform.lower()
             module = importutils.import_module(mod)
             cls = getattr(module, '%sRequest' % platform.capitalize())
             ctrl_instance = cls()
-            controller = controller_return_response(cls(), module.FAULT_MAP)
+            controller = controller_return_response(ctrl_instance, module.FAULT_MAP)
+            # client在第一次使用时创建, 这里只有导入controller的耗时
+            LOG.info('Platform %s loaded in %dms' % (platform, startup(platform.lower(), 'module', start)))
 
             self._add_resource(mapper, controller,
                                path='/%s/orders/platforms/%s' % (common.NAME, platform.lower()),
@@ -55,6 +81,11 @@ class Routers(router.RoutersBase):
 
             ctrl_instance.extrouters(self, mapper, controller)
 
+            if cls.CLIENT:
+                RECONCILER.register(cls.CLIENT)
+
             # self._add_resource(mapper, controller,
             #                    path='/%s/orders/gifts/%s' % (common.NAME, platform.lower()),
             #                    post_action='gift')
+
+        RECONCILER.start(conf)
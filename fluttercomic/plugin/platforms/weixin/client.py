@@ -4,10 +4,7 @@ import time
 
 import string
 import random
-import hashlib
 
-from lxml import etree
-import xmltodict
 
 import requests
 
@@ -19,7 +16,9 @@ from goperation.manager.filters.filter import AuthFilter
 
 from fluttercomic.plugin.platforms import exceptions
 from fluttercomic.plugin.platforms.base import PlatFormClient
+from fluttercomic.plugin.platforms.cache import CredentialCache
 from fluttercomic.plugin.platforms.weixin.config import NAME
+from fluttercomic.plugin.platforms.weixin import codec
 
 
 LOG = logging.getLogger(__name__)
@@ -40,7 +39,8 @@ class WeiXinApi(PlatFormClient):
     def __init__(self, conf):
         super(WeiXinApi, self).__init__(NAME, conf)
 
-        self.api = self.SANDBOXAPI if self.sandbox else self.API
+        self.api = conf.api or (self.SANDBOXAPI if self.sandbox else self.API)
+        self.credentials = CredentialCache(conf.signkey_ttl)
 
         self.appid = conf.appId
         self.secret = conf.secret
@@ -61,31 +61,26 @@ class WeiXinApi(PlatFormClient):
 
     @staticmethod
     def calculate_signature(params, api_key=None):
-        url = WeiXinApi.format_url(params, api_key)
-        return encodeutils.safe_decode(hashlib.md5(url).hexdigest().upper())
+        return codec.sign(params, api_key or '')
 
     @staticmethod
-    def dict_to_xml_string(data):
-        root = etree.Element('xml')
-        root.text = '\n'
-        for key in data:
-            em = etree.Element(key)
-            em.text = data[key]
-            em.tail = '\n'
-            root.append(em)
-        return etree.tostring(root)
+    def dict_to_xml_string(data, api_key=None):
+        return codec.dumps(data, api_key)
 
     @staticmethod
     def decrypt_xml_to_dict(buf):
-        return xmltodict.parse(encodeutils.safe_decode(buf))['xml']
+        return codec.loads(buf)
 
     @property
     def sandbox_sign(self):
+        return self.credentials.get(self.mchid, self._sandbox_signkey)
+
+    def _sandbox_signkey(self):
         data = {'mch_id': self.mchid, 'nonce_str': random_string(), 'signType': 'MD5'}
         data['sign'] = WeiXinApi.calculate_signature(data, self.secret)
-        url = WeiXinApi.SANDBOXAPI + '/pay/getsignkey'
-        resp = self.session.post(url, data=WeiXinApi.dict_to_xml_string(data),
-                                 headers={"Content-Type": "application/xml"}, timeout=3)
+        url = self.api + '/pay/getsignkey'
+        resp = self.gateway.post(url, data=WeiXinApi.dict_to_xml_string(data), idempotent=True,
+                                 headers={"Content-Type": "application/xml"})
         rdata = WeiXinApi.decrypt_xml_to_dict(resp.text)
         if rdata.get('return_code') != 'SUCCESS':
             # 微信sandbox接口 msg字段retmsg  不统一
@@ -119,22 +114,20 @@ class WeiXinApi(PlatFormClient):
             'notify_url': req.path_url + '/%d' % oid,
             'trade_type': 'APP',
         }
-        data['sign'] = self.sandbox_sign if self.sandbox else WeiXinApi.calculate_signature(data, self.secret)
-        return self.dict_to_xml_string(data), _random_str
+        return codec.dumps(data, self.sandbox_sign if self.sandbox else self.secret), _random_str
 
     def _orderquery_xml(self, oid):
         data = {
-            'appId': self.appid,
+            'appid': self.appid,
             'mch_id': self.mchid,
-            'nonceStr': random_string(),
-            'transaction_id': str(oid),
+            'nonce_str': random_string(),
+            'out_trade_no': str(oid),
         }
-        return self.dict_to_xml_string(data)
+        return codec.dumps(data, self.sandbox_sign if self.sandbox else self.secret)
 
     def _check_sign(self, data):
         if not self.sandbox:
-            sign = data.pop('sign', None)
-            if not sign or sign != WeiXinApi.calculate_signature(data, self.secret):
+            if not codec.verify(data, self.secret):
                 raise exceptions.OrderError('Sign not the same')
 
     def esure_notify(self, data, order):
@@ -165,11 +158,15 @@ class WeiXinApi(PlatFormClient):
         money = int(money*self.roe)
         data, random_str = self._unifiedorder_xml(money, oid, timeline, req)
         url = self.api + '/pay/unifiedorder'
-        resp = self.session.post(url, data=data,
-                                 headers={"Content-Type": "application/xml"}, timeout=10)
+        # 相同out_trade_no和参数重复下单返回同一个prepay_id, 可以重试
+        resp = self.gateway.post(url, data=data, idempotent=True,
+                                 headers={"Content-Type": "application/xml"})
         result = WeiXinApi.decrypt_xml_to_dict(resp.text)
         if result.get('return_code') != 'SUCCESS':
             LOG.error('Create WeiXin request payment api fail: %s' % result.get('return_msg'))
+            if self.sandbox:
+                # sign key可能已经变化, 下次重新获取
+                self.credentials.invalidate(self.mchid)
             raise exceptions.CreateOrderError('Create WeiXin order fail')
         if result.get('result_code') != 'SUCCESS':
             LOG.error('Create WeiXin order fail')
@@ -177,9 +174,21 @@ class WeiXinApi(PlatFormClient):
         self._check_sign(result)
         return result['prepay_id'], result['sign'], random_str
 
-    def esure_order(self, order):
+    def query(self, order):
+        """主动查询订单, 未支付返回None"""
         url = self.api + '/pay/orderquery'
-        resp = self.session.get(url, data=self._orderquery_xml(order.oid),
-                                headers={"Content-Type": "application/xml"}, timeout=10)
+        resp = self.gateway.post(url, data=self._orderquery_xml(order.oid), idempotent=True,
+                                 headers={"Content-Type": "application/xml"})
+        data = WeiXinApi.decrypt_xml_to_dict(resp.text)
+        if data.get('return_code') == 'SUCCESS' and data.get('result_code') == 'SUCCESS' \
+                and data.get('trade_state') != 'SUCCESS':
+            LOG.debug('WeiXin order %d trade state %s' % (order.oid, data.get('trade_state')))
+            return None
         return self.esure_notify(resp.text, order)
 
+    def esure_order(self, order):
+        result = self.query(order)
+        if result is None:
+            raise exceptions.EsureOrderError('WeiXin order not paid')
+        return result
+
@@ -0,0 +1,95 @@
+# -*- coding:utf-8 -*-
+"""微信支付xml编解码
+
+微信支付的xml只有一层, <xml>下每个元素一个字段
+编码时排序一次, 同时生成xml和签名字符串
+解码用expat流式解析为dict, 值为utf8编码的str
+"""
+import hashlib
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+ROOT = 'xml'
+SIGN = 'sign'
+
+
+def _text(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value if isinstance(value, str) else str(value)
+
+
+def _md5(fields, key):
+    fields.append('key=%s' % _text(key))
+    return hashlib.md5('&'.join(fields)).hexdigest().upper()
+
+
+def sign(data, key):
+    """MD5签名, 空值和sign字段不参与签名, 与dumps规则相同, 数字0参与签名"""
+    fields = []
+    for k in sorted(data):
+        if k == SIGN or data[k] is None:
+            continue
+        value = _text(data[k])
+        if value:
+            fields.append('%s=%s' % (k, value))
+    return _md5(fields, key)
+
+
+def dumps(data, key=None):
+    """生成xml, key不为空时计算签名并写入sign字段"""
+    parts = ['<xml>']
+    fields = []
+    for k in sorted(data):
+        if k == SIGN and key:
+            continue
+        value = data[k]
+        if value is None:
+            continue
+        value = _text(value)
+        if key and value:
+            fields.append('%s=%s' % (k, value))
+        parts.append('<%s>%s</%s>' % (k, escape(value), k))
+    if key:
+        parts.append('<sign>%s</sign>' % _md5(fields, key))
+    parts.append('</xml>')
+    return ''.join(parts)
+
+
+def loads(buf):
+    if isinstance(buf, unicode):
+        buf = buf.encode('utf-8')
+    data = {}
+    stack = []
+    texts = []
+
+    def start(name, attrs):
+        if len(stack) >= 2 or (not stack and name != ROOT):
+            raise ValueError('WeiXin xml element %s not expected' % name)
+        stack.append(name)
+        del texts[:]
+
+    def end(name):
+        stack.pop()
+        if stack:
+            data[name] = ''.join(texts)
+
+    def chars(text):
+        if len(stack) == 2:
+            texts.append(text)
+
+    parser = expat.ParserCreate('utf-8')
+    parser.returns_unicode = False
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = chars
+    try:
+        parser.Parse(buf, True)
+    except expat.ExpatError as e:
+        raise ValueError('WeiXin xml parse error: %s' % e)
+    return data
+
+
+def verify(data, key):
+    """校验解码结果的签名"""
+    return bool(data.get(SIGN)) and data[SIGN] == sign(data, key)
@@ -34,6 +34,13 @@ weixin_opts = [
                min=60, max=7200,
                default=300,
                help='WeiXin Order overtime, by seconds'),
+    cfg.IntOpt('signkey_ttl',
+               min=0, max=86400,
+               default=3600,
+               help='WeiXin sandbox sign key cache seconds'),
+    cfg.StrOpt('api',
+               help='WeiXin pay api url, default is WeiXin api or sandbox api, '
+                    'set to a local stand-in server for load test'),
 ]
 
 
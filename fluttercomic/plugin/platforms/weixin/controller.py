@@ -27,7 +27,7 @@ from goperation.manager.utils import resultutils
 
 from fluttercomic import common
 from fluttercomic.plugin.platforms.base import PlatformsRequestBase
-from fluttercomic.plugin.platforms.weixin.client import WeiXinApi
+from fluttercomic.plugin.platforms.base import LazyClient
 
 from fluttercomic.models import Order
 from fluttercomic.models import User
@@ -45,12 +45,14 @@ LOG = logging.getLogger(__name__)
 
 CONF.register_group(config.group)
 config.register_opts(config.group)
-weiXinApi = WeiXinApi(CONF[config.group.name])
+weiXinApi = LazyClient(config.NAME, 'fluttercomic.plugin.platforms.weixin.client.WeiXinApi', config.group.name)
 
 FAULT_MAP = {InvalidArgument: webob.exc.HTTPClientError,
              NoResultFound: webob.exc.HTTPNotFound,
              MultipleResultsFound: webob.exc.HTTPInternalServerError,
-             exceptions.EsureOrderError: webob.exc.HTTPInternalServerError
+             exceptions.EsureOrderError: webob.exc.HTTPInternalServerError,
+             exceptions.GatewayError: webob.exc.HTTPBadGateway,
+             exceptions.GatewayUnavailable: webob.exc.HTTPServiceUnavailable,
              }
 
 
@@ -70,6 +72,7 @@ NEWPAYMENT = {
 @singleton.singleton
 class WeixinRequest(PlatformsRequestBase):
 
+    CLIENT = weiXinApi
 
     def new(self, req, body=None):
         """发起订单"""
@@ -104,11 +107,17 @@ class WeixinRequest(PlatformsRequestBase):
         otime = uuidutils.Gprimarykey.timeformat(oid)
         if (now - otime) > weiXinApi.overtime*2000 or otime > now:
             raise InvalidArgument('Order id error or overtime')
-        session = endpoint_session()
-        query = model_query(session, Order, filter=Order.oid == oid)
-        order = query.one()
-        serial, extdata = weiXinApi.esure_notify(body, order)
-        self.record(session, order, serial, extdata)
+
+        def _notify():
+            session = endpoint_session()
+            query = model_query(session, Order, filter=Order.oid == oid)
+            order = query.one()
+            if not self.recorded(order):
+                serial, extdata = weiXinApi.esure_notify(body, order)
+                self.record(session, order, serial, extdata)
+            return self.recharged(order)
+
+        self.idempotent(oid, _notify)
         return webob.Response(request=req, status=200, content_type='application/xml',
                               body=weiXinApi.success)
 
@@ -119,7 +128,7 @@ class WeixinRequest(PlatformsRequestBase):
         oid = int(oid)
         now = int(time.time()*1000)
         otime = uuidutils.Gprimarykey.timeformat(oid)
-        if (now - otime) > weiXinApi.overtime*2 or otime > now:
+        if (now - otime) > weiXinApi.overtime*2000 or otime > now:
             raise InvalidArgument('Order id error or overtime')
 
         session = endpoint_session(readonly=True)   # 注意主从不同步的可能
@@ -128,11 +137,16 @@ class WeixinRequest(PlatformsRequestBase):
         if recharge:
             return resultutils.results(result='esure orde success',
                                        data=[dict(oid=oid, coins=recharge.gift+recharge.coin, money=recharge.money)])
-        session = endpoint_session()
-        query = model_query(session, Order, filter=Order.oid == oid)
-        order = query.one()
-        serial, extdata = weiXinApi.esure_order(order)
-        self.record(session, order, serial, extdata)
+
+        def _esure():
+            session = endpoint_session()
+            query = model_query(session, Order, filter=Order.oid == oid)
+            order = query.one()
+            if not self.recorded(order):
+                serial, extdata = weiXinApi.esure_order(order)
+                self.record(session, order, serial, extdata)
+            return self.recharged(order)
+
         return resultutils.results(result='esure orde success',
-                                   data=[dict(oid=oid, coins=order.gift+order.coin, money=order.money)])
+                                   data=[self.idempotent(oid, _esure)])
 
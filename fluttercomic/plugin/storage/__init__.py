@@ -0,0 +1,65 @@
+# -*- coding:utf-8 -*-
+"""转换后的图片存储
+
+转换总是在本地basedir/cdn下进行, 完成后由存储后端发布
+发布后的key与本地目录结构一致 cdn/<cid>/<chapter>/<file>
+
+    local       本地文件系统, 转换目录就是发布目录
+    s3          S3 API兼容存储, 需要boto3
+"""
+import os
+
+from simpleutil.utils import importutils
+
+CDNDIR = 'cdn'
+
+
+def comic_key(cid):
+    return '%s/%d' % (CDNDIR, cid)
+
+
+def chapter_key(cid, chapter):
+    return '%s/%d/%d' % (CDNDIR, cid, chapter)
+
+
+class Storage(object):
+
+    # 发布目录就是本地目录, 为False时本地目录只是转换用的工作目录
+    LOCAL = False
+
+    def __init__(self, basedir):
+        self.basedir = basedir
+
+    def local(self, key):
+        """key对应的本地路径"""
+        return os.path.join(self.basedir, *key.split('/'))
+
+    def put(self, key):
+        """发布本地单个文件"""
+        raise NotImplementedError
+
+    def publish(self, key, path=None):
+        """发布本地目录下所有文件, path为空时发布key对应的本地目录"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """删除已发布目录"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """读取已发布文件, 不存在返回None"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        """已发布文件是否存在"""
+        raise NotImplementedError
+
+    def copy(self, src, dst):
+        """复制已发布文件"""
+        raise NotImplementedError
+
+
+def load(name, basedir):
+    module = importutils.import_module('fluttercomic.plugin.storage.%s' % name)
+    cls = getattr(module, '%sStorage' % name.capitalize())
+    return cls(basedir)
@@ -0,0 +1,39 @@
+# -*- coding:utf-8 -*-
+import os
+import shutil
+
+from fluttercomic.plugin.storage import Storage
+
+
+class LocalStorage(Storage):
+    """文件已经在发布目录中, 由nginx直接提供"""
+
+    LOCAL = True
+
+    def put(self, key):
+        if not os.path.exists(self.local(key)):
+            raise ValueError('%s not exist' % key)
+
+    def publish(self, key, path=None):
+        path = path or self.local(key)
+        if not os.path.isdir(path):
+            raise ValueError('%s not exist' % key)
+        return len(os.listdir(path))
+
+    def delete(self, key):
+        path = self.local(key)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+    def get(self, key):
+        try:
+            with open(self.local(key), 'rb') as f:
+                return f.read()
+        except (OSError, IOError):
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self.local(key))
+
+    def copy(self, src, dst):
+        shutil.copy(self.local(src), self.local(dst))
@@ -0,0 +1,143 @@
+# -*- coding:utf-8 -*-
+import os
+import mimetypes
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from boto3.s3.transfer import create_transfer_manager
+from botocore.client import Config
+from botocore.exceptions import ClientError
+
+from simpleutil.config import cfg
+
+from fluttercomic import common
+from fluttercomic.plugin.storage import Storage
+
+CONF = cfg.CONF
+
+NAME = 's3'
+
+# 章节发布后不会变化
+CACHECONTROL = 'public, max-age=31536000'
+
+mimetypes.add_type('image/webp', '.webp')
+
+group = cfg.OptGroup(name='%s.%s' % (common.NAME, NAME), title='Fluttercomic S3 API storage')
+
+s3_opts = [
+    cfg.StrOpt('endpoint',
+               help='S3 API endpoint url, empty for aws s3'),
+    cfg.StrOpt('region',
+               help='S3 region name'),
+    cfg.StrOpt('bucket',
+               help='S3 bucket of cdn files'),
+    cfg.StrOpt('prefix',
+               default='',
+               help='Key prefix in bucket'),
+    cfg.StrOpt('access_key',
+               help='S3 access key'),
+    cfg.StrOpt('secret_key',
+               secret=True,
+               help='S3 secret key'),
+    cfg.BoolOpt('path_style',
+                default=True,
+                help='Use path style bucket address, minio and most self hosted S3 need it'),
+    cfg.IntOpt('concurrency',
+               default=8,
+               min=1, max=64,
+               help='Max parallel uploads, files and multipart parts share it'),
+    cfg.IntOpt('chunksize',
+               default=8 * 1024 * 1024,
+               min=5 * 1024 * 1024,
+               help='Multipart upload threshold and part size'),
+]
+
+CONF.register_opts(s3_opts, group)
+
+
+class S3Storage(Storage):
+
+    def __init__(self, basedir, conf=None):
+        super(S3Storage, self).__init__(basedir)
+        conf = conf or CONF[group.name]
+        if not conf.bucket:
+            raise ValueError('S3 storage bucket not set')
+        self.bucket = conf.bucket
+        self.prefix = conf.prefix.strip('/')
+        self.client = boto3.client('s3',
+                                   endpoint_url=conf.endpoint or None,
+                                   region_name=conf.region,
+                                   aws_access_key_id=conf.access_key,
+                                   aws_secret_access_key=conf.secret_key,
+                                   config=Config(signature_version='s3v4',
+                                                 max_pool_connections=conf.concurrency,
+                                                 s3=dict(addressing_style='path' if conf.path_style else 'auto')))
+        self.config = TransferConfig(multipart_threshold=conf.chunksize,
+                                     multipart_chunksize=conf.chunksize,
+                                     max_concurrency=conf.concurrency)
+
+    def remote(self, key):
+        return '%s/%s' % (self.prefix, key) if self.prefix else key
+
+    @staticmethod
+    def _missing(e):
+        return e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    @staticmethod
+    def _extra(filename, cache=None):
+        extra = dict(ContentType=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        if cache:
+            extra['CacheControl'] = cache
+        return extra
+
+    def put(self, key):
+        path = self.local(key)
+        self.client.upload_file(path, self.bucket, self.remote(key),
+                                ExtraArgs=self._extra(path), Config=self.config)
+
+    def publish(self, key, path=None):
+        """所有文件并行上传, 大文件分块并行上传"""
+        path = path or self.local(key)
+        files = [filename for filename in sorted(os.listdir(path))
+                 if not filename.startswith('.') and os.path.isfile(os.path.join(path, filename))]
+        manager = create_transfer_manager(self.client, self.config)
+        try:
+            futures = [manager.upload(os.path.join(path, filename), self.bucket,
+                                      self.remote('%s/%s' % (key, filename)),
+                                      extra_args=self._extra(filename, CACHECONTROL))
+                       for filename in files]
+            for future in futures:
+                future.result()
+        finally:
+            manager.shutdown()
+        return len(files)
+
+    def delete(self, key):
+        prefix = self.remote(key) + '/'
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects = [dict(Key=obj['Key']) for obj in page.get('Contents', [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete=dict(Objects=objects, Quiet=True))
+
+    def get(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.remote(key))['Body'].read()
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.remote(key))
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+        return True
+
+    def copy(self, src, dst):
+        self.client.copy_object(Bucket=self.bucket, Key=self.remote(dst),
+                                CopySource=dict(Bucket=self.bucket, Key=self.remote(src)),
+                                MetadataDirective='REPLACE', **self._extra(dst))
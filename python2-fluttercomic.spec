@@ -65,6 +65,10 @@ install -p -D -m 0755 bin/* %{buildroot}%{_bindir}
 %{python_sitelib}/%{proj_name}/cmd
 %{python_sitelib}/%{proj_name}-%{version}-py?.?.egg-info
 %{_sbindir}/%{proj_name}-init
+%{_sbindir}/%{proj_name}-import
+%{_sbindir}/%{proj_name}-migrate
+%{_sbindir}/%{proj_name}-partition
+%{_sbindir}/%{proj_name}-upgrade
 %{_bindir}/%{proj_name}-resize
 %{_bindir}/%{proj_name}-websocket
 %doc README.md
@@ -54,7 +54,7 @@ setup(
     keywords=['fluttercomic'],
     license='MIT',
     packages=find_packages(include=['fluttercomic*']),
-    tests_require=['pytest>=1.9.0'],
+    tests_require=['pytest>=1.9.0', 'pytest-benchmark>=3.1.0'],
     cmdclass={'test': PyTest},
     classifiers=[
         'Development Status :: 5 - Production/Stable',
@@ -0,0 +1,49 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""Run micro benchmark
+
+    python test/benchmark/bench.py save          # run and store new baseline
+    python test/benchmark/bench.py compare       # run and compare with last baseline, fail on regression
+    python test/benchmark/bench.py compare 0001  # compare with given baseline
+    python test/benchmark/bench.py list          # list stored baselines
+"""
+import os
+import sys
+
+import pytest
+
+BENCHPATH = os.path.abspath(os.path.dirname(__file__))
+STORAGE = os.path.join(BENCHPATH, 'baselines')
+
+# mean time regression over this value means fail
+THRESHOLD = 'mean:15%'
+
+
+def main():
+    args = sys.argv[1:]
+    action = args[0] if args else 'compare'
+    options = [BENCHPATH, '-q', '-p', 'no:cacheprovider',
+               '--benchmark-storage=file://%s' % STORAGE,
+               '--benchmark-columns=min,mean,stddev,ops,rounds',
+               '--benchmark-sort=name']
+    if action == 'save':
+        options.append('--benchmark-autosave')
+    elif action == 'compare':
+        if not os.path.exists(STORAGE):
+            sys.stderr.write('No baseline found, run save first\n')
+            sys.exit(1)
+        options.append('--benchmark-compare=%s' % args[1] if len(args) > 1 else '--benchmark-compare')
+        options.append('--benchmark-compare-fail=%s' % THRESHOLD)
+    elif action == 'list':
+        for root, dirs, files in os.walk(STORAGE):
+            for filename in sorted(files):
+                print os.path.join(os.path.relpath(root, STORAGE), filename)
+        return
+    else:
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+    sys.exit(pytest.main(options))
+
+
+if __name__ == '__main__':
+    main()
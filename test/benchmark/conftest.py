@@ -0,0 +1,113 @@
+# -*- coding:utf-8 -*-
+import os
+import imp
+import random
+import string
+import shutil
+import tempfile
+
+import msgpack
+import pytest
+
+BASEPATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+RESIZE = os.path.join(BASEPATH, 'bin', 'fluttercomic-resize')
+
+
+NOTIFYXML = '''<xml>
+<appid><![CDATA[wx2421b1c4370ec43b]]></appid>
+<attach><![CDATA[支付测试]]></attach>
+<bank_type><![CDATA[CFT]]></bank_type>
+<fee_type><![CDATA[CNY]]></fee_type>
+<is_subscribe><![CDATA[Y]]></is_subscribe>
+<mch_id><![CDATA[10000100]]></mch_id>
+<nonce_str><![CDATA[5d2b6c2a8db53831f7eda20af46e531c]]></nonce_str>
+<openid><![CDATA[oUpF8uMEb4qRXf22hE3X68TekukE]]></openid>
+<out_trade_no><![CDATA[1409811653]]></out_trade_no>
+<result_code><![CDATA[SUCCESS]]></result_code>
+<return_code><![CDATA[SUCCESS]]></return_code>
+<sign><![CDATA[B552ED6B279343CB493C5DD0D78AB241]]></sign>
+<time_end><![CDATA[20140903131540]]></time_end>
+<total_fee>1</total_fee>
+<coupon_fee><![CDATA[10]]></coupon_fee>
+<coupon_count><![CDATA[1]]></coupon_count>
+<coupon_type><![CDATA[CASH]]></coupon_type>
+<coupon_id><![CDATA[10000]]></coupon_id>
+<coupon_fee_0><![CDATA[100]]></coupon_fee_0>
+<trade_type><![CDATA[JSAPI]]></trade_type>
+<transaction_id><![CDATA[1004400740201409030005092168]]></transaction_id>
+</xml>'''
+
+
+IPAYRESPONSE = ('transdata=%7B%22transid%22%3A%2232011806081652263281%22%2C%22code%22%3A0%7D'
+                '&sign=kHcgVr0HIiyGyYUM1Wd0oY5YS8jYYtuPVRXMnxrRr6dYG1P3JHyB8CIT6w%2BoQm4gkJhRI'
+                'Jy4QTdQyyXwmAEW5u6bFgc9DBzQ1mVxu%2F0DmgGuBQj4pWdsOoGIDwXbuMsoCY0kTf%2FPzDKsR'
+                'J9H3xdx5p%2BxDWTk8pf7ZEBZx4p4rho%3D&signtype=RSA')
+
+
+def random_key(length=6):
+    return ''.join(random.sample(string.lowercase, length))
+
+
+@pytest.fixture(scope='session')
+def resize():
+    """load bin/fluttercomic-resize as module"""
+    module = imp.load_source('fluttercomic_resize', RESIZE)
+    module.CONF.register_cli_opts(module.command_opts)
+    return module
+
+
+@pytest.fixture(scope='session')
+def chapters():
+    """a 1000 chapters comic, chapter info packed as Comic.chapters"""
+    rand = random.Random(1000)
+    return msgpack.packb([[rand.randint(15, 300), random_key()] for _ in range(1000)])
+
+
+@pytest.fixture(scope='module')
+def chapterdir():
+    """a chapter path with 300 scanlation style file names"""
+    path = tempfile.mkdtemp(prefix='fluttercomic-benchmark-')
+    names = []
+    for page in range(1, 301):
+        if page % 3 == 0:
+            names.append('p%d_%d.jpg' % (page, page % 7))
+        elif page % 3 == 1:
+            names.append('%03d.png' % page)
+        else:
+            names.append('comic_v01_c012_%d.webp' % page)
+    random.Random(300).shuffle(names)
+    for name in names:
+        with open(os.path.join(path, name), 'wb') as f:
+            f.write('')
+    yield path
+    shutil.rmtree(path)
+
+
+@pytest.fixture(scope='session')
+def notify():
+    return NOTIFYXML
+
+
+@pytest.fixture(scope='session')
+def unifiedorder():
+    """request params build by WeiXinApi._unifiedorder_xml"""
+    return {
+        'appId': 'wx2421b1c4370ec43b',
+        'mch_id': '10000100',
+        'nonceStr': '1add1a30ac87aa2d',
+        'signType': 'MD5',
+        'body': u'漫画-充值',
+        'time_start': '20181019120000',
+        'time_expire': '20181019120500',
+        'out_trade_no': '6453921837584220161',
+        'fee_type': 'CNY',
+        'total_fee': '600',
+        'spbill_create_ip': '14.23.150.211',
+        'notify_url': 'http://comic.example.com/n1.0/fluttercomic/orders/platforms/weixin/6453921837584220161',
+        'trade_type': 'APP',
+    }
+
+
+@pytest.fixture(scope='session')
+def ipayresponse():
+    return IPAYRESPONSE
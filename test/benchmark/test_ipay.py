@@ -0,0 +1,91 @@
+"""iPay sign/verify/decode throughput under concurrent order creation
+
+every order signs a transdata, decodes a url encoded response and verifies
+its sign, like IPayApi.payment without the http request. compare
+test_orders[inline] (RSA in the greenthread) with test_orders[tpool],
+extra_info.ticks counts how often the hub ran another greenthread meanwhile
+"""
+import os
+import shutil
+import tempfile
+from urllib import urlencode
+from collections import namedtuple
+
+import eventlet
+import pytest
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from fluttercomic.plugin.platforms.ipay.client import IPayApi
+
+ORDERS = 64
+CONCURRENCY = 16
+
+CONF = namedtuple('conf', ['sandbox', 'roe', 'scale', 'currency', 'choices',
+                           'appId', 'appUid', 'waresId', 'url_r', 'url_h', 'signtype', 'h5',
+                           'rsa_private', 'rsa_public', 'concurrency', 'queue_timeout',
+                           'connect_timeout', 'timeout', 'retries', 'backoff',
+                           'breaker_threshold', 'breaker_reset'])
+
+TRANSDATA = '{"appid":"3017541447","cporderid":"%d","price":6.0,"currency":"RMB"}'
+
+
+def test_decode(benchmark, ipayresponse):
+    results = benchmark(IPayApi.decode, ipayresponse, IPayApi.TRANSDATA)
+    assert results['signtype'] == 'RSA'
+
+
+@pytest.fixture(scope='module')
+def ipay():
+    path = tempfile.mkdtemp(prefix='fluttercomic-benchmark-')
+    key = rsa.generate_private_key(public_exponent=65537, key_size=1024, backend=default_backend())
+    private = os.path.join(path, 'private.key')
+    public = os.path.join(path, 'public.key')
+    with open(private, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(public, 'wb') as f:
+        f.write(key.public_key().public_bytes(serialization.Encoding.PEM,
+                                              serialization.PublicFormat.SubjectPublicKeyInfo))
+    yield IPayApi(CONF(True, 1.0, 100, 'CNY', [6, 30], '3017541447', 'fluttercomic', 1,
+                       None, None, 'RSA', False, private, public,
+                       25, 1, 3, 10, 0, 0, 0, 30))
+    shutil.rmtree(path)
+
+
+def _order(api, oid, sign, verify):
+    transdata = TRANSDATA % oid
+    response = urlencode(dict(transdata=transdata, sign=sign(transdata), signtype='RSA'))
+    results = IPayApi.decode(response, IPayApi.TRANSDATA)
+    assert verify(results[IPayApi.TRANSDATA], results['sign'])
+
+
+@pytest.mark.parametrize('mode', ['inline', 'tpool'])
+def test_orders(benchmark, ipay, mode):
+    if mode == 'tpool':
+        sign = lambda data: ipay.mksign(data, 'RSA')
+        verify = lambda data, s: ipay.verify(data, s, 'RSA')
+    else:
+        sign = ipay._rsa_sign
+        verify = lambda data, s: ipay._rsa_verify(data, s) or True
+    ticks = []
+
+    def ticker(stop):
+        while not stop:
+            ticks.append(1)
+            eventlet.sleep(0)
+
+    def run():
+        stop = []
+        thread = eventlet.spawn(ticker, stop)
+        pool = eventlet.GreenPool(CONCURRENCY)
+        for oid in xrange(ORDERS):
+            pool.spawn_n(_order, ipay, oid, sign, verify)
+        pool.waitall()
+        stop.append(1)
+        thread.wait()
+
+    benchmark.extra_info['orders'] = ORDERS
+    benchmark.pedantic(run, rounds=5, iterations=1)
+    benchmark.extra_info['ticks'] = len(ticks)
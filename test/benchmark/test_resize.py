@@ -0,0 +1,3 @@
+def test_getfiles(benchmark, resize, chapterdir):
+    files = benchmark(resize.getfiles, chapterdir)
+    assert len(files) == 300
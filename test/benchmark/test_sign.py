@@ -0,0 +1,7 @@
+from fluttercomic.api.wsgi.sign import PageSigner
+
+
+def test_sign_chapter(benchmark):
+    signer = PageSigner('192006250b4c09247ec02edce69f6a2d')
+    urls = benchmark(signer.chapter, 8, 3, 300, 'webp', 1000)
+    assert len(urls) == 300
@@ -0,0 +1,31 @@
+from fluttercomic.api.wsgi import token
+
+
+class FakeProvider(object):
+    """Token already verified by auth filter"""
+
+    TOKEN = {'uid': 1000, 'name': 'benchmark'}
+
+    @staticmethod
+    def token(req):
+        return FakeProvider.TOKEN
+
+    @staticmethod
+    def is_fernet(req):
+        return True
+
+
+def show(req, uid, body=None):
+    return uid
+
+
+def test_token_verify(benchmark, monkeypatch):
+    monkeypatch.setattr(token, 'TokenProvider', FakeProvider)
+    func = token.verify()(show)
+    assert benchmark(func, object(), uid='1000') == '1000'
+
+
+def test_token_verify_both(benchmark, monkeypatch):
+    monkeypatch.setattr(token, 'TokenProvider', FakeProvider)
+    func = token.verify(vtype=token.B)(show)
+    assert benchmark(func, object(), uid='1000') == '1000'
@@ -0,0 +1,12 @@
+from fluttercomic.api.wsgi.utils import format_chapters
+
+
+def test_format_chapters_guest(benchmark, chapters):
+    results = benchmark(format_chapters, 10, chapters, 0)
+    assert len(results) == 1000
+
+
+def test_format_chapters_payed(benchmark, chapters):
+    results = benchmark(format_chapters, 10, chapters, 800)
+    assert results[799]['key']
+    assert not results[800]['key']
@@ -0,0 +1,37 @@
+# -*- coding:utf-8 -*-
+from fluttercomic.plugin.platforms.weixin.client import WeiXinApi
+from fluttercomic.plugin.platforms.weixin import codec
+
+SECRET = '192006250b4c09247ec02edce69f6a2d'
+
+
+def test_format_url(benchmark, unifiedorder):
+    benchmark(WeiXinApi.format_url, unifiedorder, SECRET)
+
+
+def test_calculate_signature(benchmark, unifiedorder):
+    sign = benchmark(WeiXinApi.calculate_signature, unifiedorder, SECRET)
+    assert len(sign) == 32
+
+
+def test_dict_to_xml_string(benchmark, unifiedorder):
+    benchmark(WeiXinApi.dict_to_xml_string, unifiedorder)
+
+
+def test_decrypt_xml_to_dict(benchmark, notify):
+    data = benchmark(WeiXinApi.decrypt_xml_to_dict, notify)
+    assert data['return_code'] == 'SUCCESS'
+
+
+def test_codec_dumps_signed(benchmark, unifiedorder):
+    buf = benchmark(codec.dumps, unifiedorder, SECRET)
+    assert codec.verify(codec.loads(buf), SECRET)
+
+
+def test_codec_loads_verify(benchmark, notify):
+    def run():
+        data = codec.loads(notify)
+        codec.verify(data, SECRET)
+        return data
+    data = benchmark(run)
+    assert data['return_code'] == 'SUCCESS'
@@ -0,0 +1,41 @@
+import time
+
+from fluttercomic.api.wsgi import progress
+
+
+def test_stages():
+    registry = progress.ProgressRegistry()
+    registry.start(1, 2)
+    registry.stage(1, 2, progress.CONVERTING)
+    callback = registry.callback(1, 2)
+    callback(3, 10)
+    info = registry.get(1, 2).to_dict()
+    assert info['stage'] == progress.CONVERTING
+    assert (info['done'], info['total']) == (3, 10)
+    assert info['version'] == 2
+    registry.stage(1, 2, progress.FAILED, error='convert fail')
+    assert registry.get(1, 2).error == 'convert fail'
+    assert registry.get(1, 3) is None
+
+
+def test_wait():
+    registry = progress.ProgressRegistry(interval=0.01)
+    registry.start(1, 2)
+    start = time.time()
+    assert registry.wait(1, 2, 0, 0.05).version == 0
+    assert time.time() - start >= 0.05
+    registry.callback(1, 2)(1, 10)
+    assert registry.wait(1, 2, 0, 10).done == 1
+    registry.stage(1, 2, progress.FINISHED)
+    assert registry.wait(1, 2, 2, 10).stage == progress.FINISHED
+
+
+def test_expire():
+    registry = progress.ProgressRegistry(keep=0, stale=60)
+    registry.start(1, 2)
+    registry.stage(1, 2, progress.FINISHED)
+    registry.start(1, 3)
+    registry.get(1, 2).time -= 1
+    registry.start(1, 4)
+    assert registry.get(1, 2) is None
+    assert registry.get(1, 3) is not None
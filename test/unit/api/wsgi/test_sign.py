@@ -0,0 +1,35 @@
+import base64
+import hashlib
+
+from fluttercomic.api.wsgi.sign import PageSigner
+
+
+def nginx_md5(expires, uri, uid, secret):
+    """value of nginx secure_link_md5 "$secure_link_expires$uri$arg_uid $secret" """
+    md5 = hashlib.md5('%d%s%d %s' % (expires, uri, uid, secret)).digest()
+    return base64.urlsafe_b64encode(md5).rstrip('=')
+
+
+def test_nginx_compatible():
+    signer = PageSigner('secret', '/cdn/')
+    urls = signer.chapter(8, 3, 300, 'webp', 1000, expires=2000000000)
+    assert len(urls) == 300
+    uri, query = urls[9].split('?')
+    assert uri == '/cdn/8/3/10.webp'
+    assert query == 'md5=%s&expires=2000000000&uid=1000' % nginx_md5(2000000000, uri, 1000, 'secret')
+    assert urls[9] == signer.url(uri, 1000, 2000000000)
+
+
+def test_rendition():
+    signer = PageSigner('secret')
+    url = signer.chapter(8, 3, 1, 'webp', 1000, size='800x600', expires=2000000000)[0]
+    assert url.startswith('/cdn/8/3/1_800x600.webp?')
+
+
+def test_verify():
+    signer = PageSigner('secret')
+    token = signer.sign('/cdn/8/3/1.webp', 1000, 2000000000)
+    assert signer.verify('/cdn/8/3/1.webp', '1000', token, '2000000000')
+    assert not signer.verify('/cdn/8/3/1.webp', 1001, token, 2000000000)
+    assert not signer.verify('/cdn/8/3/2.webp', 1000, token, 2000000000)
+    assert not signer.verify('/cdn/8/3/1.webp', 1000, token, 2000000000, now=2000000001)
@@ -0,0 +1,47 @@
+import contextlib
+
+from fluttercomic.api.wsgi import stats
+
+
+class FakeSession(object):
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield
+
+    def execute(self, sql, rows):
+        if self.fail:
+            raise IOError('database gone')
+        self.executed.append(rows)
+
+
+def test_rows():
+    rows = stats.ComicCounter.rows({1: [3, 1]}, 86400 * 10 + 3600 * 5 + 12)
+    assert dict(cid=1, period=stats.HOUR, bucket=86400 * 10 + 3600 * 5, views=3, buys=1) in rows
+    assert dict(cid=1, period=stats.DAY, bucket=86400 * 10, views=3, buys=1) in rows
+
+
+def test_flush():
+    session = FakeSession()
+    counter = stats.ComicCounter(lambda: session)
+    counter.worker = object()
+    counter.view(1)
+    counter.view(1)
+    counter.buy(2)
+    assert counter.flush() == 2
+    assert len(session.executed[0]) == 4
+    assert counter.flush() == 0
+
+
+def test_flush_fail():
+    session = FakeSession(fail=True)
+    counter = stats.ComicCounter(lambda: session)
+    counter.worker = object()
+    counter.view(1)
+    assert counter.flush() == 0
+    counter.view(1)
+    assert counter.counts == {1: [2, 0]}
@@ -0,0 +1,23 @@
+import msgpack
+
+from fluttercomic.api.wsgi import utils
+
+
+def test_chapter_info():
+    assert utils.chapter_info(10, 'abc') == [10, 'abc']
+    assert utils.chapter_info(10, 'abc', ['800x600']) == [10, 'abc', ['800x600']]
+    assert utils.chapter_info(10, 'abc', size=2048) == [10, 'abc', [], 2048]
+    assert utils.chapter_bytes([10, 'abc']) == 0
+    assert utils.chapter_bytes([10, 'abc', [], 2048]) == 2048
+
+
+def test_prefetch():
+    chapters = msgpack.packb([utils.chapter_info(index, 'k%d' % index, size=index * 100)
+                              for index in xrange(1, 11)])
+    # 1-4 free, 5-6 payed
+    infos = utils.prefetch_chapters(5, chapters, 3, 5, payed=6)
+    assert [chapter for chapter, info in infos] == [3, 4, 5, 6]
+    assert infos[0][1] == [3, 'k3', [], 300]
+    infos = utils.prefetch_chapters(5, chapters, 9, 5, payed=10)
+    assert [chapter for chapter, info in infos] == [9, 10]
+    assert utils.prefetch_chapters(5, chapters, 7, 3, payed=6) == []
@@ -0,0 +1,49 @@
+from fluttercomic.models import UserPayLog
+from fluttercomic.cmd.db import migrate
+
+
+class Result(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConn(object):
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.executed = []
+
+    def execute(self, sql, **params):
+        sql = str(sql)
+        self.executed.append((sql, params))
+        if sql.startswith('SELECT'):
+            start = tuple(params[k] for k in sorted(params)) if params else None
+            keys = [key for key in self.keys if start is None or key > start]
+            return Result(keys[:2])
+        if sql.startswith('INSERT'):
+            return Result([key for key in self.keys
+                           if (params['k0'], params['k1'], params['k2']) <= key <=
+                           (params['e0'], params['e1'], params['e2'])])
+        return Result([])
+
+
+def test_triggers():
+    migrator = migrate.TableMigrator(None, UserPayLog.__table__, 'InnoDB', 2)
+    triggers = dict((when, action) for name, when, action in migrator._triggers())
+    assert triggers['AFTER INSERT'].startswith('REPLACE INTO `%s`' % migrator.new)
+    assert 'NEW.`time`' in triggers['AFTER UPDATE']
+    assert triggers['AFTER DELETE'].endswith('`uid` = OLD.`uid` AND `cid` = OLD.`cid` AND `chapter` = OLD.`chapter`')
+
+
+def test_copy():
+    keys = [(1, 1, 1), (1, 1, 2), (1, 2, 1), (2, 1, 1), (3, 1, 1)]
+    conn = FakeConn(keys)
+    migrator = migrate.TableMigrator(conn, UserPayLog.__table__, 'InnoDB', 2)
+    assert migrator.copy() == 5
+    inserts = [sql for sql, params in conn.executed if sql.startswith('INSERT IGNORE')]
+    assert len(inserts) == 3
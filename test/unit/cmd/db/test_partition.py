@@ -0,0 +1,63 @@
+import calendar
+
+from fluttercomic.models import Order
+from fluttercomic.cmd.db import partition
+
+
+class Result(object):
+
+    def __init__(self, rows=None, scalar=None):
+        self.rows = rows or []
+        self.value = scalar
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConn(object):
+
+    def __init__(self, partitions, oldest=None):
+        self.names = partitions
+        self.oldest = oldest
+        self.executed = []
+
+    def execute(self, sql, **params):
+        sql = str(sql)
+        if 'information_schema' in sql:
+            return Result(rows=[(name, ) for name in self.names])
+        if sql.startswith('SELECT MIN'):
+            return Result(scalar=self.oldest)
+        self.executed.append(sql)
+        return Result()
+
+
+NOW = calendar.timegm((2018, 11, 20, 8, 0, 0))
+
+
+def test_months():
+    assert partition.add_months(2018, 11, 3) == (2019, 2)
+    assert partition.add_months(2018, 1, -1) == (2017, 12)
+    assert partition.partition_define(2018, 12) == \
+        'PARTITION p201812 VALUES LESS THAN (%d)' % calendar.timegm((2019, 1, 1, 0, 0, 0))
+
+
+def test_init():
+    conn = FakeConn([], oldest=calendar.timegm((2018, 9, 3, 0, 0, 0)))
+    names = partition.TablePartition(conn, Order.__table__).init(2, now=NOW)
+    assert names == ['p201809', 'p201810', 'p201811', 'p201812', 'p201901']
+    sql = conn.executed[0]
+    assert 'ADD PRIMARY KEY (`oid`, `time`)' in sql
+    assert 'ADD UNIQUE INDEX `serial_unique` (`serial`, `time`)' in sql
+    assert sql.endswith('PARTITION pmax VALUES LESS THAN MAXVALUE)')
+
+
+def test_rotate_archive():
+    conn = FakeConn(['p201710', 'p201711', 'p201811', 'pmax'])
+    table = partition.TablePartition(conn, Order.__table__)
+    assert table.rotate(2, now=NOW) == ['p201812', 'p201901']
+    assert table.rotate(0, now=NOW) == []
+    archived = table.archive(12, now=NOW)
+    assert archived == ['%s_201710' % Order.__tablename__]
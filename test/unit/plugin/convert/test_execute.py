@@ -0,0 +1,34 @@
+import pytest
+
+from fluttercomic.plugin import convert
+
+
+def _execute(monkeypatch, script, progress=None):
+    monkeypatch.setattr(convert, 'CONVERT', '/bin/sh')
+    return convert.execute(['sh', '-c', script], progress)
+
+
+def test_progress(monkeypatch):
+    reports = []
+    script = 'echo progress 0 2; echo other line; echo progress 1 2; echo progress 2 2'
+    job = _execute(monkeypatch, script, lambda done, total: reports.append((done, total)))
+    assert job.code == 0
+    assert reports == [(0, 2), (1, 2), (2, 2)]
+
+
+def test_cpu_time(monkeypatch):
+    job = _execute(monkeypatch, 'i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done')
+    assert job.utime + job.stime > 0
+    assert job.elapsed > 0
+
+
+def test_fail(monkeypatch):
+    with pytest.raises(ValueError):
+        _execute(monkeypatch, 'exit 3')
+
+
+def test_count_pages(tmpdir):
+    for name in ('1.webp', '2.webp', '3.webp', 'pages.bin', '4_800x600.webp', 'x.webp'):
+        tmpdir.join(name).write('page')
+    assert convert.count_pages(str(tmpdir), 'webp') == 3
+    assert sum(convert.page_sizes(str(tmpdir), 'webp', 3)) == 12
@@ -0,0 +1,30 @@
+from fluttercomic.plugin.convert import pages
+
+
+def test_natural():
+    names = ['p10_2.jpg', 'p2_10.jpg', 'p2_9.jpg', '10.jpg', '2.jpg', '001.jpg']
+    assert pages.sort_pages(names) == ['001.jpg', '2.jpg', '10.jpg', 'p2_9.jpg', 'p2_10.jpg', 'p10_2.jpg']
+
+
+def test_page():
+    names = ['c013_p01.jpg', 'c012_p10.jpg', 'c012_p03.jpg', 'credits.jpg']
+    assert pages.sort_pages(names, pages.PAGE) == ['c013_p01.jpg', 'c012_p03.jpg', 'c012_p10.jpg', 'credits.jpg']
+
+
+def test_last():
+    names = ['img (10).jpg', 'Vol01-Ch003-012.jpg', 'img (9).jpg']
+    assert pages.sort_pages(names, pages.LAST) == ['img (9).jpg', 'img (10).jpg', 'Vol01-Ch003-012.jpg']
+
+
+def test_regex():
+    names = ['c013_p01.jpg', 'c012_p10.jpg', 'c012_p03.jpg', 'cover.jpg']
+    assert pages.sort_pages(names, r'c(\d+)_p(\d+)') == ['c012_p03.jpg', 'c012_p10.jpg', 'c013_p01.jpg', 'cover.jpg']
+
+
+def test_bad_regex():
+    for rule in ('c(\\d+', 'c\\d+'):
+        try:
+            pages.sortkey(rule)
+        except ValueError:
+            continue
+        raise AssertionError('rule %s should fail' % rule)
@@ -0,0 +1,40 @@
+import os
+import struct
+import hashlib
+import tempfile
+
+import pytest
+
+from fluttercomic.plugin.convert import sidecar
+
+
+def test_dumps():
+    pages = [sidecar.PAGEMETA(1200, 900, 123456, 'a' * 8),
+             sidecar.PAGEMETA(800, 1800, 99, 'b' * 8)]
+    buf = sidecar.dumps(pages)
+    assert len(buf) == sidecar.HEADER.size + sidecar.PAGE.size * 2
+    assert sidecar.loads(buf) == pages
+    with pytest.raises(ValueError):
+        sidecar.loads(buf[:-1])
+    with pytest.raises(ValueError):
+        sidecar.loads('XXXX' + buf[4:])
+
+
+def test_page():
+    buf = 'GIF89a' + struct.pack('<HH', 320, 240) + '\x00' * 64
+    path = tempfile.mkdtemp()
+    try:
+        img = os.path.join(path, '1.gif')
+        with open(img, 'wb') as f:
+            f.write(buf)
+        meta = sidecar.page(img)
+        assert meta == (320, 240, len(buf), hashlib.md5(buf).digest()[:8])
+        target = os.path.join(path, sidecar.filename())
+        sidecar.write(target, [meta])
+        with open(target, 'rb') as f:
+            assert sidecar.loads(f.read()) == [meta]
+        assert sorted(os.listdir(path)) == ['1.gif', 'pages.bin']
+    finally:
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
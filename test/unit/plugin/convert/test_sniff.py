@@ -0,0 +1,59 @@
+import os
+import struct
+import tempfile
+
+from fluttercomic.plugin.convert import sniff
+
+
+def _sniff(buf):
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, buf)
+        os.close(fd)
+        return sniff.sniff(path)
+    finally:
+        os.remove(path)
+
+
+def _pad(buf):
+    return buf + '\x00' * 64
+
+
+def test_png():
+    buf = '\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + 'IHDR' + struct.pack('>II', 1200, 1800)
+    assert _sniff(_pad(buf))[:3] == ('png', 1200, 1800)
+
+
+def test_gif():
+    assert _sniff(_pad('GIF89a' + struct.pack('<HH', 320, 240)))[:3] == ('gif', 320, 240)
+
+
+def test_bmp():
+    buf = 'BM' + '\x00' * 12 + struct.pack('<Iii', 40, 800, -600)
+    assert _sniff(_pad(buf))[:3] == ('bmp', 800, 600)
+
+
+def test_webp():
+    lossy = 'RIFF\x00\x00\x00\x00WEBPVP8 \x00\x00\x00\x00' + '\x00\x00\x00\x9d\x01\x2a' + \
+            struct.pack('<HH', 1200, 900)
+    assert _sniff(_pad(lossy))[:3] == ('webp', 1200, 900)
+    bits = (1199) | (899 << 14)
+    lossless = 'RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f' + struct.pack('<I', bits)
+    assert _sniff(_pad(lossless))[:3] == ('webp', 1200, 900)
+    extended = 'RIFF\x00\x00\x00\x00WEBPVP8X\x00\x00\x00\x00\x00\x00\x00\x00' + \
+               struct.pack('<I', 1199)[:3] + struct.pack('<I', 899)[:3]
+    assert _sniff(_pad(extended))[:3] == ('webp', 1200, 900)
+
+
+def test_jpg():
+    app0 = '\xff\xe0' + struct.pack('>H', 16) + 'JFIF\x00' + '\x00' * 9
+    sof = '\xff\xc0' + struct.pack('>HBHH', 17, 8, 900, 1200) + '\x00' * 10
+    buf = '\xff\xd8' + app0 + sof + '\xff\xda'
+    info = _sniff(buf)
+    assert info == ('jpg', 1200, 900, len(buf))
+    assert sniff.fit(info, 1200, 900)
+    assert not sniff.fit(info, 800, 600)
+
+
+def test_not_img():
+    assert _sniff(_pad('not a img file')) is None
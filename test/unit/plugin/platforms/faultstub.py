@@ -0,0 +1,68 @@
+# -*- coding:utf-8 -*-
+"""本地支付平台替身, 按顺序注入故障
+
+    stub.faults.append(('delay', 0.5))    # 延迟响应
+    stub.faults.append(('status', 503))   # 返回错误码
+    stub.faults.append(('close', None))   # 不响应直接断开连接
+
+没有故障时返回200和stub.body
+"""
+import time
+import threading
+import BaseHTTPServer
+import SocketServer
+
+
+class FaultStub(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, body='{}'):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), FaultHandler)
+        self.body = body
+        self.faults = []
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def fault(self):
+        with self.lock:
+            self.calls += 1
+            return self.faults.pop(0) if self.faults else (None, None)
+
+
+class FaultHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        fault, value = self.server.fault()
+        if fault == 'close':
+            self.close_connection = 1
+            return
+        if fault == 'delay':
+            time.sleep(value)
+        self.send_response(value if fault == 'status' else 200)
+        self.send_header('Content-Length', str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    do_GET = _handle
+    do_POST = _handle
@@ -0,0 +1,55 @@
+import time
+
+import eventlet
+import pytest
+
+from fluttercomic.plugin.platforms.cache import ResultCache
+from fluttercomic.plugin.platforms.cache import CredentialCache
+
+
+def test_size():
+    cache = ResultCache(60, size=2)
+    for key in (1, 2, 3):
+        cache.get(key, lambda: key * 10)
+    assert list(cache.values) == [2, 3]
+    assert cache.get(1, lambda: 'reload') == 'reload'
+    assert not cache.locks
+
+
+def test_single_flight():
+    cache = ResultCache(60, size=10)
+    calls = []
+
+    def _record():
+        calls.append(1)
+        eventlet.sleep(0.1)
+        return dict(oid=1, coins=600)
+
+    pool = eventlet.GreenPool()
+    results = list(pool.imap(lambda _: cache.get(1, _record), range(8)))
+    assert len(calls) == 1
+    assert results == [dict(oid=1, coins=600)] * 8
+    assert not cache.locks
+
+
+def test_cache_ttl():
+    cache = CredentialCache(0.05)
+    loads = []
+    loader = lambda: loads.append(1) or len(loads)
+    assert cache.get('a', loader) == 1
+    assert cache.get('a', loader) == 1
+    time.sleep(0.06)
+    assert cache.get('a', loader) == 2
+    cache.invalidate('a')
+    assert cache.get('a', loader) == 3
+
+
+def test_cache_loader_fail():
+    cache = CredentialCache(60)
+
+    def _fail():
+        raise ValueError('platform down')
+
+    with pytest.raises(ValueError):
+        cache.get('a', _fail)
+    assert cache.get('a', lambda: 'key') == 'key'
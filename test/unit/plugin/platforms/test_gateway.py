@@ -0,0 +1,95 @@
+# -*- coding:utf-8 -*-
+import time
+from collections import namedtuple
+
+import pytest
+
+from fluttercomic.plugin.platforms import exceptions
+from fluttercomic.plugin.platforms import gateway
+
+from faultstub import FaultStub
+
+CONF = namedtuple('conf', ['concurrency', 'queue_timeout', 'connect_timeout', 'timeout',
+                           'retries', 'backoff', 'breaker_threshold', 'breaker_reset'])
+
+
+@pytest.fixture
+def stub():
+    server = FaultStub().start()
+    yield server
+    server.stop()
+
+
+def _gateway(**kwargs):
+    conf = dict(concurrency=2, queue_timeout=0.05, connect_timeout=1, timeout=0.2,
+                retries=2, backoff=0.01, breaker_threshold=3, breaker_reset=0.3)
+    conf.update(kwargs)
+    return gateway.Gateway('test', CONF(**conf))
+
+
+def test_retry_idempotent(stub):
+    gw = _gateway()
+    stub.faults.extend([('status', 503), ('close', None)])
+    assert gw.get(stub.url + '/query').status_code == 200
+    assert stub.calls == 3
+    assert gw.latency.retries == 2
+    assert gw.breaker.state == gateway.CLOSED
+
+
+def test_no_retry_not_idempotent(stub):
+    gw = _gateway()
+    stub.faults.append(('status', 502))
+    with pytest.raises(exceptions.GatewayError):
+        gw.post(stub.url + '/order')
+    assert stub.calls == 1
+    # 4xx是平台正常响应, 交给调用方处理
+    stub.faults.append(('status', 400))
+    assert gw.post(stub.url + '/order').status_code == 400
+
+
+def test_circuit_breaker(stub):
+    gw = _gateway(retries=0)
+    stub.faults.extend([('delay', 0.3)] * 3)
+    for _ in xrange(3):
+        with pytest.raises(exceptions.GatewayError):
+            gw.get(stub.url + '/query')
+    assert gw.breaker.state == gateway.OPEN
+    calls = stub.calls
+    with pytest.raises(exceptions.GatewayUnavailable):
+        gw.get(stub.url + '/query')
+    assert stub.calls == calls
+    time.sleep(0.3)
+    assert gw.get(stub.url + '/query').status_code == 200
+    assert gw.breaker.state == gateway.CLOSED
+
+
+def test_circuit_breaker_other_error(stub, monkeypatch):
+    gw = _gateway(retries=0, breaker_threshold=1, breaker_reset=0.1)
+    gw.breaker.failure()
+    time.sleep(0.1)
+
+    def _fail(*args, **kwargs):
+        raise TypeError('bad argument')
+
+    monkeypatch.setattr(gw.session, 'request', _fail)
+    with pytest.raises(TypeError):
+        gw.get(stub.url + '/query')
+    assert gw.breaker.state == gateway.OPEN
+    assert not gw.breaker.probing
+    monkeypatch.undo()
+    time.sleep(0.1)
+    assert gw.get(stub.url + '/query').status_code == 200
+    assert gw.breaker.state == gateway.CLOSED
+
+
+def test_concurrency_limit(stub):
+    gw = _gateway(concurrency=1)
+    gw.semaphore.acquire()
+    with pytest.raises(exceptions.GatewayUnavailable):
+        gw.get(stub.url + '/query')
+    gw.semaphore.release()
+    assert gw.get(stub.url + '/query').status_code == 200
+    metrics = gw.metrics()
+    assert metrics['latency']['rejected'] == 1
+    assert metrics['latency']['count'] == 1
+    assert metrics['free'] == 1
@@ -0,0 +1,28 @@
+from simpleutil.config import cfg
+
+from fluttercomic.plugin.platforms import base
+from fluttercomic.plugin.platforms import reconciler
+
+CREATED = []
+
+
+class FakeClient(object):
+
+    def __init__(self, conf):
+        CREATED.append(conf)
+        self.roe = conf.roe
+
+
+def test_lazy_client():
+    group = cfg.OptGroup(name='fluttercomic.lazytest')
+    cfg.CONF.register_group(group)
+    cfg.CONF.register_opts([cfg.FloatOpt('roe', default=2.0)], group)
+    client = base.LazyClient('lazytest', 'test_lazy.FakeClient', group.name)
+    reconciler.Reconciler(None, None).register(client)
+    assert client.name == 'lazytest'
+    assert not CREATED
+    assert client.roe == 2.0
+    assert client.roe == 2.0
+    assert len(CREATED) == 1
+    assert base.STARTUP['lazytest']['client'] >= 0
+    assert base.STARTUP['lazytest']['module'] is None
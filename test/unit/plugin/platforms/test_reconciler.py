@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+from fluttercomic.plugin.platforms import exceptions
+from fluttercomic.plugin.platforms import reconciler
+
+Order = namedtuple('Order', ['oid', 'serial', 'money'])
+
+
+class FakeClient(object):
+
+    name = 'fake'
+    sandbox = True
+
+    def __init__(self, results):
+        self.results = results
+
+    def query(self, order):
+        result = self.results[order.oid]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_order():
+    records = []
+    rec = reconciler.Reconciler(lambda: None,
+                                lambda session, order, serial, extdata: records.append((order.oid, serial)))
+    client = FakeClient({1: ('T1', None), 2: None,
+                         3: exceptions.GatewayUnavailable('busy'), 4: ValueError('bad xml')})
+    rec.register(client)
+    stats = rec.stats[client.name]
+    for oid in xrange(1, 5):
+        rec._order(client, Order(oid, None, 6), stats)
+    assert records == [(1, 'T1')]
+    report = rec.report()[0]
+    assert report['platform'] == 'fake'
+    assert (report['paid'], report['unpaid'], report['failed']) == (1, 1, 2)
+
+
+def test_start_disabled():
+    conf = namedtuple('conf', ['reconcile_interval', 'reconcile_batch', 'reconcile_concurrency'])
+    rec = reconciler.Reconciler(lambda: None, None)
+    rec.register(FakeClient({}))
+    rec.start(conf(0, 100, 10))
+    assert not rec.started
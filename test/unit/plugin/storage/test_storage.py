@@ -0,0 +1,82 @@
+"""s3 test need a S3 API server, start minio and export
+
+    FLUTTERCOMIC_S3_ENDPOINT=http://127.0.0.1:9000
+    FLUTTERCOMIC_S3_BUCKET=fluttercomic-test
+    FLUTTERCOMIC_S3_ACCESS_KEY=minioadmin
+    FLUTTERCOMIC_S3_SECRET_KEY=minioadmin
+"""
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import pytest
+
+from fluttercomic.plugin import storage
+
+
+@pytest.fixture
+def basedir():
+    path = tempfile.mkdtemp()
+    chapter = os.path.join(path, 'cdn', '1', '2')
+    os.makedirs(chapter)
+    for page in xrange(1, 4):
+        with open(os.path.join(chapter, '%d.webp' % page), 'wb') as f:
+            f.write('page %d' % page)
+    with open(os.path.join(path, 'cdn', '1', 'main.webp'), 'wb') as f:
+        f.write('cover')
+    yield path
+    shutil.rmtree(path)
+
+
+def test_key():
+    assert storage.chapter_key(1, 2) == 'cdn/1/2'
+    assert storage.comic_key(1) == 'cdn/1'
+
+
+def test_local(basedir):
+    backend = storage.load('local', basedir)
+    assert backend.local(storage.chapter_key(1, 2)) == os.path.join(basedir, 'cdn', '1', '2')
+    assert backend.publish(storage.chapter_key(1, 2)) == 3
+    backend.put('cdn/1/main.webp')
+    with pytest.raises(ValueError):
+        backend.publish(storage.chapter_key(1, 3))
+    assert backend.get('cdn/1/2/1.webp') == 'page 1'
+    assert backend.get('cdn/1/2/9.webp') is None
+    backend.copy('cdn/1/2/1.webp', 'cdn/1/auto.webp')
+    assert backend.exists('cdn/1/auto.webp')
+    backend.delete(storage.chapter_key(1, 2))
+    assert not os.path.exists(os.path.join(basedir, 'cdn', '1', '2'))
+    assert not backend.exists('cdn/1/2/1.webp')
+
+
+def test_s3(basedir):
+    endpoint = os.environ.get('FLUTTERCOMIC_S3_ENDPOINT')
+    if not endpoint:
+        pytest.skip('FLUTTERCOMIC_S3_ENDPOINT not set')
+    pytest.importorskip('boto3')
+    from fluttercomic.plugin.storage import s3
+
+    conf = namedtuple('conf', ['endpoint', 'region', 'bucket', 'prefix', 'access_key', 'secret_key',
+                               'path_style', 'concurrency', 'chunksize'])
+    backend = s3.S3Storage(basedir, conf(endpoint, 'us-east-1',
+                                         os.environ.get('FLUTTERCOMIC_S3_BUCKET', 'fluttercomic-test'),
+                                         'test', os.environ.get('FLUTTERCOMIC_S3_ACCESS_KEY'),
+                                         os.environ.get('FLUTTERCOMIC_S3_SECRET_KEY'),
+                                         True, 4, 5 * 1024 * 1024))
+    key = storage.chapter_key(1, 2)
+    assert backend.publish(key) == 3
+    obj = backend.client.get_object(Bucket=backend.bucket, Key='test/cdn/1/2/1.webp')
+    assert obj['Body'].read() == 'page 1'
+    assert obj['ContentType'] == 'image/webp'
+    backend.put('cdn/1/main.webp')
+    assert backend.get('cdn/1/2/2.webp') == 'page 2'
+    assert backend.get('cdn/1/2/9.webp') is None
+    backend.copy('cdn/1/2/1.webp', 'cdn/1/auto.webp')
+    assert backend.exists('cdn/1/auto.webp')
+    assert not backend.exists('cdn/1/none.webp')
+    backend.client.delete_object(Bucket=backend.bucket, Key='test/cdn/1/auto.webp')
+    backend.delete(key)
+    listed = backend.client.list_objects_v2(Bucket=backend.bucket, Prefix='test/cdn/1/2/')
+    assert not listed.get('Contents')
+    backend.client.delete_object(Bucket=backend.bucket, Key='test/cdn/1/main.webp')
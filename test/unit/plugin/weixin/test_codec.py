@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+import hashlib
+
+import pytest
+
+from fluttercomic.plugin.platforms.weixin import codec
+
+import xmlfixtures
+
+SECRET = '192006250b4c09247ec02edce69f6a2d'
+
+
+def _md5(data, key):
+    url = '&'.join(['%s=%s' % (k, data[k]) for k in sorted(data) if data[k] and k != 'sign'])
+    return hashlib.md5(url + '&key=' + key).hexdigest().upper()
+
+
+def test_loads():
+    data = codec.loads(xmlfixtures.emp)
+    assert len(data) == 11
+    assert data['attach'] == '支付测试'
+    assert data['total_fee'] == '1'
+    assert data['sign'] == '0CB01533B8C1EF103065174F50BCA001'
+
+
+def test_cdata():
+    data = codec.loads(xmlfixtures.cdata)
+    assert data['content'] == ']]]]]]]]]]]]]'
+    assert codec.loads(codec.dumps(data)) == data
+
+
+def test_round_trip():
+    data = codec.loads(xmlfixtures.emp)
+    data['body'] = u'漫画-充值 <a&b>'
+    buf = codec.dumps(data)
+    data['body'] = data['body'].encode('utf-8')
+    assert codec.loads(buf) == data
+
+
+def test_dumps_sign():
+    data = codec.loads(xmlfixtures.emp)
+    data.pop('sign')
+    data['device_info'] = ''
+    result = codec.loads(codec.dumps(data, SECRET))
+    assert result['sign'] == _md5(data, SECRET)
+    assert result['sign'] == codec.sign(result, SECRET)
+    assert codec.verify(result, SECRET)
+    result['total_fee'] = '100'
+    assert not codec.verify(result, SECRET)
+
+
+def test_sign_zero():
+    data = dict(appid='wx2421b1c4370ec43b', total_fee=0, coupon_fee=None, attach='')
+    result = codec.loads(codec.dumps(data, SECRET))
+    assert result['sign'] == codec.sign(data, SECRET)
+    assert codec.verify(result, SECRET)
+
+
+def test_nested():
+    with pytest.raises(ValueError):
+        codec.loads('<xml><coupon><id>1</id></coupon></xml>')
+    with pytest.raises(ValueError):
+        codec.loads('<xml><appid>1</xml>')
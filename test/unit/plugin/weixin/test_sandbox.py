@@ -0,0 +1,70 @@
+# -*- coding:utf-8 -*-
+import time
+from collections import namedtuple
+
+import eventlet
+import pytest
+import webob
+
+from fluttercomic.plugin.platforms import exceptions
+from fluttercomic.plugin.platforms.weixin.client import WeiXinApi
+
+from wxstub import WeiXinStub
+
+MCHID = '10000100'
+
+CONF = namedtuple('conf', ['sandbox', 'roe', 'scale', 'currency', 'choices',
+                           'appId', 'appName', 'mchId', 'secret', 'overtime',
+                           'signkey_ttl', 'api', 'concurrency', 'queue_timeout',
+                           'connect_timeout', 'timeout', 'retries', 'backoff',
+                           'breaker_threshold', 'breaker_reset'])
+
+
+@pytest.fixture
+def stub():
+    server = WeiXinStub(MCHID).start()
+    yield server
+    server.stop()
+
+
+def _api(stub, **kwargs):
+    conf = dict(sandbox=True, roe=1.0, scale=100, currency='CNY', choices=[6, 30],
+                appId='wx2421b1c4370ec43b', appName='fluttercomic', mchId=MCHID,
+                secret='192006250b4c09247ec02edce69f6a2d', overtime=300, signkey_ttl=3600,
+                api=stub.url, concurrency=25, queue_timeout=1, connect_timeout=3, timeout=10,
+                retries=0, backoff=0, breaker_threshold=0, breaker_reset=30)
+    conf.update(kwargs)
+    return WeiXinApi(CONF(**conf))
+
+
+def _request():
+    return webob.Request.blank('/n1.0/fluttercomic/orders/platforms/weixin',
+                               environ={'REMOTE_ADDR': '127.0.0.1'})
+
+
+def test_signkey_cached(stub):
+    api = _api(stub)
+    timeline = int(time.time())
+    for oid in xrange(10):
+        prepay_id, sign, random_str = api.payment(6, 10000 + oid, timeline, _request())
+        assert prepay_id == 'wx%d' % (10000 + oid)
+    assert stub.calls['/pay/getsignkey'] == 1
+    assert stub.calls['/pay/unifiedorder'] == 10
+
+
+def test_signkey_single_flight(stub):
+    stub.delay = 0.2
+    api = _api(stub)
+    pool = eventlet.GreenPool()
+    keys = list(pool.imap(lambda _: api.sandbox_sign, xrange(10)))
+    assert keys == [stub.signkey] * 10
+    assert stub.calls['/pay/getsignkey'] == 1
+
+
+def test_signkey_refresh_after_fail(stub):
+    api = _api(stub)
+    stub.fails = 1
+    with pytest.raises(exceptions.CreateOrderError):
+        api.payment(6, 10000, int(time.time()), _request())
+    api.payment(6, 10001, int(time.time()), _request())
+    assert stub.calls['/pay/getsignkey'] == 2
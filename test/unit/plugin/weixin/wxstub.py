@@ -0,0 +1,79 @@
+# -*- coding:utf-8 -*-
+"""本地微信支付sandbox替身, 记录每个接口请求次数"""
+import time
+import threading
+import BaseHTTPServer
+import SocketServer
+
+import xmltodict
+
+from fluttercomic.plugin.platforms.weixin.client import WeiXinApi
+
+SIGNKEY = 'a26e5b3d0f1c4b1f9e3a7c5d8b2f6e01'
+
+
+class WeiXinStub(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, mchid, delay=0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), WeiXinHandler)
+        self.mchid = mchid
+        self.delay = delay
+        self.signkey = SIGNKEY
+        self.fails = 0
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, path):
+        with self.lock:
+            self.calls[path] = self.calls.get(path, 0) + 1
+
+
+class WeiXinHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, data):
+        body = WeiXinApi.dict_to_xml_string(data)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        server.count(self.path)
+        data = xmltodict.parse(self.rfile.read(int(self.headers.get('Content-Length', 0))))['xml']
+        if server.delay:
+            time.sleep(server.delay)
+        if self.path == '/pay/getsignkey':
+            return self._reply({'return_code': 'SUCCESS', 'mch_id': server.mchid,
+                                'sandbox_signkey': server.signkey})
+        if self.path == '/pay/unifiedorder':
+            sign = data.pop('sign')
+            if server.fails:
+                server.fails -= 1
+                sign = None
+            if sign != WeiXinApi.calculate_signature(data, server.signkey):
+                return self._reply({'return_code': 'FAIL', 'return_msg': 'sign error'})
+            return self._reply({'return_code': 'SUCCESS', 'result_code': 'SUCCESS',
+                                'prepay_id': 'wx%s' % data['out_trade_no'], 'sign': sign})
+        self.send_response(404)
+        self.end_headers()
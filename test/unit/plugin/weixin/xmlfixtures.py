@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from lxml import etree
+"""微信支付文档中的xml样例"""
 
 
 emp = '''
@@ -19,33 +19,9 @@ emp = '''
 '''
 
 
-root = etree.Element('xml')
-root.text = '\n'
-
-
-em = etree.Element('appid')
-em.text = 'lkjglaga'
-em.tail = '\n'
-root.append(em)
-
-
-em = etree.Element('attach')
-em.text = 'test attach'
-em.tail = '\n'
-root.append(em)
-
-
-em = etree.Element('body')
-em.text = 'test body'
-em.tail = '\n'
-root.append(em)
-
-
-em = etree.Element('content')
-em.text = etree.CDATA(']]]]]]]]]]]]]')
-em.tail = '\n'
-root.append(em)
-
-print dir(root)
-
-print etree.tostring(root)
\ No newline at end of file
+cdata = '''<xml>
+<appid>lkjglaga</appid>
+<attach>test attach</attach>
+<body>test body</body>
+<content><![CDATA[]]]]]]]]]]]]]]]></content>
+</xml>'''